@@ -0,0 +1,90 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Compare how long each installed JSON codec takes to decode realistic nation pages.
+
+Run from the repository root with ``PYTHONPATH=. python benchmarks/bench_codec.py``.
+"""
+
+
+from pwpy import codec
+
+import random
+import timeit
+
+
+def nation_page(size: int = 500, seed: int = 0) -> dict:
+    """
+    Build a page shaped like a within_war_range response, with cities and wars.
+    """
+    rng = random.Random(seed)
+
+    def war() -> dict:
+        return {"id": str(rng.randrange(10 ** 6)), "winner": "0", "turns_left": rng.randrange(60)}
+
+    nations = [
+        {
+            "id": str(rng.randrange(10 ** 6)),
+            "nation_name": f"Nation {index}",
+            "leader_name": f"Leader {index}",
+            "color": rng.choice(("green", "blue", "beige", "red", "black")),
+            "alliance_id": str(rng.randrange(10 ** 4)),
+            "alliance_position": "MEMBER",
+            "alliance": {"name": f"Alliance {index % 50}", "score": rng.uniform(1000, 500000)},
+            "war_policy": "ATTRITION",
+            "flag": f"https://politicsandwar.com/uploads/flag_{index}.png",
+            "num_cities": rng.randrange(1, 40),
+            "score": rng.uniform(100, 8000),
+            "espionage_available": rng.random() > 0.5,
+            "last_active": "2022-06-01T12:00:00+00:00",
+            "soldiers": rng.randrange(500000),
+            "tanks": rng.randrange(50000),
+            "aircraft": rng.randrange(5000),
+            "ships": rng.randrange(500),
+            "missiles": rng.randrange(20),
+            "nukes": rng.randrange(10),
+            "cities": [{"powered": rng.random() > 0.05} for _ in range(rng.randrange(1, 40))],
+            "offensive_wars": [war() for _ in range(rng.randrange(6))],
+            "defensive_wars": [war() for _ in range(rng.randrange(4))]
+        }
+        for index in range(size)
+    ]
+
+    return {"data": {"nations": {"data": nations, "paginatorInfo": {"lastPage": 120}}}}
+
+
+def main(pages: int = 20, repeat: int = 5) -> None:
+    document = codec.STDLIB.dumps(nation_page()).encode()
+    print(f"decoding a {len(document) / 1024:.0f} KiB page of 500 nations, best of {repeat} x {pages} pages")
+
+    baseline = None
+
+    for json_codec in reversed(codec.available()):
+        seconds = min(timeit.repeat(lambda: json_codec.loads(document), number=pages, repeat=repeat)) / pages
+        baseline = baseline or seconds
+        print(f"{json_codec.name:>8}: {seconds * 1000:7.2f} ms per page ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
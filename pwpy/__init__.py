@@ -28,6 +28,17 @@ __all__ = [
     "utils",
     "urls",
     "scrape",
+    "scheduler",
+    "loader",
+    "cache",
+    "filters",
+    "index",
+    "snapshot",
+    "sync",
+    "stream",
+    "codec",
+    "models",
+    "costs",
     "__version__"
 ]
 
@@ -38,6 +49,17 @@ from pwpy import exceptions
 from pwpy import utils
 from pwpy import urls
 from pwpy import scrape
+from pwpy import scheduler
+from pwpy import loader
+from pwpy import cache
+from pwpy import filters
+from pwpy import index
+from pwpy import snapshot
+from pwpy import sync
+from pwpy import stream
+from pwpy import codec
+from pwpy import models
+from pwpy import costs
 
 
 __version__ = "0.6.0"
@@ -15,9 +15,13 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from pwpy import urls, utils, exceptions
+from pwpy import urls, utils, exceptions, scheduler, cache, stream, codec
 
+import contextlib
 import asyncio
+import random
+import copy
+import json
 import aiohttp
 import typing
 
@@ -25,12 +29,32 @@ import typing
 __all__ = [
     "set_token",
     "fetch_query",
-    "BulkQuery"
+    "CompiledQuery",
+    "Client",
+    "BulkQuery",
+    "BulkResult",
+    "FailedChunk",
+    "TRANSIENT_ERRORS",
+    "PERMANENT_ERRORS"
 ]
 
 
 TOKEN = None
 
+TRANSIENT_ERRORS: tuple = (
+    aiohttp.ClientError,
+    asyncio.TimeoutError,
+    exceptions.ServerError,
+    exceptions.RateLimited
+)
+
+PERMANENT_ERRORS: tuple = (
+    exceptions.InvalidToken,
+    exceptions.InvalidQuery,
+    exceptions.TokenNotGiven,
+    exceptions.UnexpectedResponse
+)
+
 
 def set_token(token: str) -> None:
     """
@@ -40,64 +64,556 @@ def set_token(token: str) -> None:
     TOKEN = token
 
 
-async def fetch_query(query: dict or str, *, token: str = TOKEN) -> typing.Any:
+class CompiledQuery:
+    """
+    A query parsed once into a gql document, taking its arguments as variables.
+
+    Arguments referencing a variable are written as "$name" in the query dict, and each
+    variable is declared with its gql type, for example {"id": "[Int]", "first": "Int"}.
+    """
+
+    __slots__: typing.List = [
+        "name",
+        "variables",
+        "document"
+    ]
+
+    def __init__(self, name: str, query: dict, variables: typing.Dict[str, str] = None) -> None:
+        """
+        :param name: The operation name of the query.
+        :param query: A query formatted as a dict.
+        :param variables: The gql types of the variables the query takes, by name.
+        """
+        self.name = name
+        self.variables = variables or {}
+
+        definitions = ", ".join(f"${variable}: {kind}" for variable, kind in self.variables.items())
+        definitions = f"({definitions})" if definitions else ""
+        self.document = f"query {name}{definitions} {{{utils.parse_query(query)}}}"
+
+    def __repr__(self) -> str:
+        return f"CompiledQuery({self.document!r})"
+
+
+class Client:
+    """
+    A long-lived client owning a single pooled session for the gql api.
+
+    Connections are kept alive and reused between queries, DNS lookups are cached and
+    responses are requested compressed. A client may be used as an async context manager
+    or closed explicitly with :meth:`close`. When given a scheduler every request is paced
+    through it and rate limit responses are retried once the server allows. With coalescing
+    enabled, identical queries issued while one is already in flight await its response
+    rather than sending their own. When given a cache, responses are served from it until
+    they expire. Requests are encoded and responses decoded with the fastest JSON codec
+    installed unless another is given.
+    """
+
+    __slots__: typing.List = [
+        "token",
+        "scheduler",
+        "coalesce",
+        "cache",
+        "codec",
+        "requests",
+        "coalesced",
+        "_inflight",
+        "_session",
+        "_limit",
+        "_limit_per_host",
+        "_dns_ttl",
+        "_keepalive",
+        "_timeout"
+    ]
+
+    def __init__(
+        self,
+        token: str = None, *,
+        limit: int = 100,
+        limit_per_host: int = 30,
+        dns_ttl: int = 300,
+        keepalive: float = 30.0,
+        timeout: float = 60.0,
+        scheduler: scheduler.Scheduler = None,
+        coalesce: bool = False,
+        cache: cache.Cache = None,
+        codec: codec.Codec = codec.DEFAULT
+    ) -> None:
+        """
+        :param token: A valid Politics and War API key used when a query provides none. Defaults to the package key.
+        :param limit: Maximum number of simultaneous connections.
+        :param limit_per_host: Maximum number of simultaneous connections to a single host.
+        :param dns_ttl: Seconds a resolved host is cached for.
+        :param keepalive: Seconds an idle connection is kept open for reuse.
+        :param timeout: Total seconds allowed for a single request.
+        :param scheduler: A scheduler to pace requests with.
+        :param coalesce: Whether identical in-flight queries share a single request.
+        :param cache: A cache to serve responses from.
+        :param codec: The JSON codec to encode requests and decode responses with.
+        """
+        self.token = token
+        self.scheduler = scheduler
+        self.coalesce = coalesce
+        self.cache = cache
+        self.codec = codec
+        self.requests = 0
+        self.coalesced = 0
+        self._inflight: typing.Dict[tuple, list] = {}
+        self._session: typing.Optional[aiohttp.ClientSession] = None
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._dns_ttl = dns_ttl
+        self._keepalive = keepalive
+        self._timeout = timeout
+
+    async def __aenter__(self) -> "Client":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        The underlying session, created on first use.
+        """
+        if self.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+                ttl_dns_cache=self._dns_ttl,
+                keepalive_timeout=self._keepalive
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                headers={"Accept-Encoding": "gzip, deflate"},
+                json_serialize=self.codec.dumps
+            )
+
+        return self._session
+
+    async def close(self) -> None:
+        """
+        Close the underlying session and release all pooled connections.
+        """
+        if not self.closed:
+            await self._session.close()
+
+        self._session = None
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight)
+        }
+
+    async def fetch_query(
+        self,
+        query: dict or str or CompiledQuery, *,
+        token: str = None,
+        variables: dict = None
+    ) -> typing.Any:
+        """
+        Fetches a given query from the gql api over the pooled session.
+
+        :param query: A query formatted as a dict, or a compiled query.
+        :param token: A valid Politics and War API key. Defaults to the client token.
+        :param variables: Values for the variables of a compiled query.
+        :return: A dictionary response from the server.
+        """
+        token = token or self.token or TOKEN
+
+        if not token:
+            raise exceptions.TokenNotGiven("an api key was not provided for this request!")
+
+        if isinstance(query, CompiledQuery):
+            document = query.document
+
+        else:
+            if isinstance(query, dict):
+                query = utils.parse_query(query)
+
+            document = f"{{{query}}}"
+
+        if self.cache is not None:
+            response = self.cache.lookup(token, document, variables)
+
+            if response is not None:
+                return response
+
+        if self.coalesce:
+            return await self._fetch_shared(token, document, variables)
+
+        return await self._fetch(token, document, variables)
+
+    async def _fetch(self, token: str, document: str, variables: typing.Optional[dict]) -> typing.Any:
+        payload = {"query": document}
+
+        if variables:
+            payload["variables"] = variables
+
+        self.requests += 1
+        response = await self._post(token, payload)
+        utils.parse_errors(response)
+
+        if self.cache is not None:
+            self.cache.store(token, document, response["data"], variables)
+
+        return response["data"]
+
+    async def _fetch_shared(self, token: str, document: str, variables: typing.Optional[dict]) -> typing.Any:
+        key = (token, document, json.dumps(variables, sort_keys=True) if variables else None)
+        shared = self._inflight.get(key)
+
+        if shared is None:
+            task = asyncio.ensure_future(self._fetch(token, document, variables))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+            shared = self._inflight[key] = [task, 1]
+
+        else:
+            self.coalesced += 1
+            shared[1] += 1
+
+        task, _ = shared
+        response = await asyncio.shield(task)
+
+        # callers sharing a response each get their own copy to mutate freely
+        return copy.deepcopy(response) if shared[1] > 1 else response
+
+    def _slot(self, token: str) -> typing.AsyncContextManager:
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+
+        return self.scheduler.slot(token)
+
+    @contextlib.asynccontextmanager
+    async def _request(self, token: str, payload: dict) -> typing.AsyncIterator[aiohttp.ClientResponse]:
+        attempt = 0
+
+        while True:
+            async with self._slot(token):
+                async with self.session.post(urls.API + token, json=payload) as response:
+                    if response.status != 429:
+                        yield response
+                        return
+
+                    retry_after = scheduler.parse_retry_after(response.headers.get("Retry-After"))
+
+                    if self.scheduler is not None:
+                        self.scheduler.pause(retry_after)
+
+            if self.scheduler is None or attempt >= self.scheduler.max_retries:
+                raise exceptions.RateLimited(retry_after)
+
+            attempt += 1
+
+    async def _post(self, token: str, payload: dict) -> typing.Any:
+        async with self._request(token, payload) as response:
+            body = await response.read()
+
+            if response.status >= 500:
+                raise exceptions.ServerError(f"{response.status}: {body[:200]!r}")
+
+            try:
+                return self.codec.loads(body)
+
+            except ValueError:
+                raise exceptions.ServerError(f"{response.status}: {body[:200]!r}") from None
+
+    async def stream_query(
+        self,
+        query: dict or str or CompiledQuery,
+        field: str, *,
+        token: str = None,
+        variables: dict = None,
+        extras: dict = None
+    ) -> typing.AsyncIterator[dict]:
+        """
+        Fetches a query on a paginated field, yielding each record as it is decoded from the response.
+
+        Streamed queries bypass the cache and coalescing, but are still paced by the scheduler.
+
+        :param query: A query formatted as a dict, or a compiled query.
+        :param field: The paginated field, or alias, whose records are to be yielded, such as "nations".
+        :param token: A valid Politics and War API key. Defaults to the client token.
+        :param variables: Values for the variables of a compiled query.
+        :param extras: A dictionary to store values beside the records in, keyed by their path,
+            such as ("data", "nations", "paginatorInfo").
+        :return: An async iterator yielding each record of the field.
+        """
+        token = token or self.token or TOKEN
+
+        if not token:
+            raise exceptions.TokenNotGiven("an api key was not provided for this request!")
+
+        if isinstance(query, CompiledQuery):
+            payload = {"query": query.document}
+
+        else:
+            payload = {"query": f"{{{utils.parse_query(query) if isinstance(query, dict) else query}}}"}
+
+        if variables:
+            payload["variables"] = variables
+
+        extras = {} if extras is None else extras
+        self.requests += 1
+
+        async with self._request(token, payload) as response:
+            if response.status >= 500:
+                raise exceptions.ServerError(f"{response.status}: {(await response.read())[:200]!r}")
+
+            chunks = response.content.iter_chunked(64 * 1024)
+
+            try:
+                async for record in stream.iter_items(chunks, ("data", field, "data"), extras):
+                    yield record
+
+            except json.JSONDecodeError as error:
+                raise exceptions.ServerError(f"{response.status}: {error}") from None
+
+        if ("errors",) in extras:
+            utils.parse_errors({"errors": extras[("errors",)]})
+
+
+async def fetch_query(
+    query: dict or str or CompiledQuery, *,
+    token: str = None,
+    variables: dict = None,
+    client: Client = None
+) -> typing.Any:
     """
     Fetches a given query from the gql api using a provided api key.
 
-    :param query: A query formatted as a dict.
-    :param token: A valid Politics and War API key.
+    :param query: A query formatted as a dict, or a compiled query.
+    :param token: A valid Politics and War API key. Defaults to the package key.
+    :param variables: Values for the variables of a compiled query.
+    :param client: A client to send the query with. A temporary client is used when omitted.
     :return: A dictionary response from the server.
     """
+    if client is not None:
+        return await client.fetch_query(query, token=token, variables=variables)
+
+    token = token or TOKEN
+
     if not token:
         raise exceptions.TokenNotGiven("an api key was not provided for this request!")
 
-    if isinstance(query, dict):
-        query = utils.parse_query(query)
+    async with Client(token) as client:
+        return await client.fetch_query(query, variables=variables)
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(urls.API + token, json={"query": f"{{{query}}}"}) as response:
-            response = await response.json()
 
-    utils.parse_errors(response)
+class FailedChunk:
+    """
+    A chunk of bulk queries which could not be fetched.
+    """
 
-    return response["data"]
+    __slots__: typing.List = [
+        "handles",
+        "error",
+        "attempts"
+    ]
 
+    def __init__(self, handles: typing.List[int], error: Exception, attempts: int) -> None:
+        """
+        :param handles: The insert handles of the queries in the chunk.
+        :param error: The error of the last attempt.
+        :param attempts: The number of times the chunk was sent.
+        """
+        self.handles = handles
+        self.error = error
+        self.attempts = attempts
 
-class BulkQuery:
+    @property
+    def transient(self) -> bool:
+        return isinstance(self.error, TRANSIENT_ERRORS)
 
-    __slots__: typing.List = [
-        "_queries"
-    ]
+    def __repr__(self) -> str:
+        return f"FailedChunk(handles={self.handles!r}, error={self.error!r}, attempts={self.attempts})"
 
-    def __init__(self):
-        self._queries: list = []
 
-    @staticmethod
-    def _chunk_requests(iterable: typing.Sized, length):
-        for count in range(0, len(iterable), length):
-            chunk = {}
+class BulkResult:
+    """
+    The results of a bulk query, holding the data of every chunk fetched next to those which failed.
 
-            for entry in iterable[count:count + length]:
-                chunk.update(entry)
+    Results are read by insert handle, as with a dictionary. Failed chunks can be sent again on
+    their own with :meth:`retry`.
+    """
 
-            yield chunk
+    __slots__: typing.List = [
+        "query",
+        "data",
+        "failed"
+    ]
 
-    def insert(self, query: dict) -> None:
-        self._queries.append(query)
+    def __init__(self, query: "BulkQuery", data: typing.Dict[int, dict], failed: typing.List[FailedChunk]) -> None:
+        """
+        :param query: The bulk query the results are for.
+        :param data: The response to each fetched query, by insert handle.
+        :param failed: The chunks which could not be fetched.
+        """
+        self.query = query
+        self.data = data
+        self.failed = failed
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+    def __getitem__(self, handle: int) -> dict:
+        return self.data[handle]
+
+    def __contains__(self, handle: int) -> bool:
+        return handle in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def raise_for_failures(self) -> None:
+        """
+        Raise the error of the first failed chunk, if any.
+        """
+        if self.failed:
+            raise self.failed[0].error
+
+    async def retry(self, *, token: str = None, client: Client = None, **kwargs) -> "BulkResult":
+        """
+        Send every failed chunk again, merging whatever succeeds into these results.
+
+        :param token: A valid Politics and War API key.
+        :param client: A client to send the queries with. A temporary client is used when omitted.
+        :param kwargs: Retry options, as taken by BulkQuery.fetch_query.
+        :return: These results.
+        """
+        chunks = [chunk.handles for chunk in self.failed]
+        retried = await self.query._fetch_chunks(chunks, token=token, client=client, **kwargs)
+        self.data.update(retried.data)
+        self.failed = retried.failed
+        return self
 
-    async def fetch_query(self, *, token: str = TOKEN, chunk_size: int = 10) -> dict:
-        results = {}
 
-        chunk_size = chunk_size if chunk_size > 0 else 1
-        chunks = self._chunk_requests(self._queries, chunk_size)
-        tasks = set()
+class BulkQuery:
+    """
+    Packs many queries into as few requests as possible.
 
-        for chunk in chunks:
-            tasks.add(asyncio.create_task(fetch_query(chunk, token=token)))
+    Every inserted query is aliased so that queries on the same field, such as many
+    nations lookups by id, can share a request without overwriting one another.
+    """
 
-        response = await asyncio.gather(*tasks)
+    __slots__: typing.List = [
+        "_queries"
+    ]
 
-        for chunk in response:
-            results.update(chunk)
+    def __init__(self):
+        self._queries: typing.List[typing.Dict[str, str]] = []
 
-        return results
+    @staticmethod
+    def _chunk_requests(iterable: typing.Sized, length):
+        for count in range(0, len(iterable), length):
+            yield iterable[count:count + length]
+
+    def insert(self, query: dict) -> int:
+        """
+        Add a query to be fetched.
+
+        :param query: A query formatted as a dict.
+        :return: A handle under which the query's results are returned.
+        """
+        handle = len(self._queries)
+        aliases = {}
+
+        for name, entry in query.items():
+            alias = f"q{handle}_{len(aliases)}"
+            aliases[name] = (alias, utils.parse_query({name: {**entry, "alias": alias}}))
+
+        self._queries.append(aliases)
+        return handle
+
+    async def fetch_query(
+        self, *,
+        token: str = None,
+        chunk_size: int = 10,
+        client: Client = None,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ) -> BulkResult:
+        """
+        Fetch every inserted query.
+
+        Each chunk is sent on its own and retried after transient errors, as listed in
+        TRANSIENT_ERRORS, waiting a jittered, exponentially growing delay between attempts.
+        Errors reported by the API itself, such as querying an unknown field, are permanent.
+        Chunks which still fail, or fail with any error in PERMANENT_ERRORS, are returned
+        alongside the data of every other chunk rather than discarding it.
+
+        :param token: A valid Politics and War API key.
+        :param chunk_size: Number of inserted queries sent per request.
+        :param client: A client to send the queries with. A temporary client is used when omitted.
+        :param retries: Number of times a chunk is retried after transient errors.
+        :param backoff: Seconds waited before the first retry, doubling with every further retry.
+        :param max_backoff: Most seconds waited before any retry.
+        :return: The response to each query by insert handle, and the chunks which failed.
+        """
+        chunk_size = chunk_size if chunk_size > 0 else 1
+        chunks = [list(chunk) for chunk in self._chunk_requests(range(len(self._queries)), chunk_size)]
+        options = {"retries": retries, "backoff": backoff, "max_backoff": max_backoff}
+        return await self._fetch_chunks(chunks, token=token, client=client, **options)
+
+    async def _fetch_chunks(
+        self,
+        chunks: typing.List[typing.List[int]], *,
+        token: str = None,
+        client: Client = None,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ) -> BulkResult:
+        if client is None:
+            async with Client(token) as client:
+                return await self._fetch_chunks(
+                    chunks, token=token, client=client, retries=retries, backoff=backoff, max_backoff=max_backoff
+                )
+
+        async def fetch(handles: typing.List[int]) -> typing.Union[dict, FailedChunk]:
+            query = " ".join(parsed for handle in handles for _, parsed in self._queries[handle].values())
+            attempt = 0
+
+            while True:
+                attempt += 1
+
+                try:
+                    return await client.fetch_query(query, token=token)
+
+                except TRANSIENT_ERRORS as error:
+                    if attempt > retries:
+                        return FailedChunk(handles, error, attempt)
+
+                    delay = min(max_backoff, backoff * 2 ** (attempt - 1))
+                    delay = random.uniform(delay / 2, delay)
+
+                    if isinstance(error, exceptions.RateLimited):
+                        delay = max(delay, error.retry_after)
+
+                    await asyncio.sleep(delay)
+
+                except PERMANENT_ERRORS as error:
+                    return FailedChunk(handles, error, attempt)
+
+        data = {}
+        failed = []
+
+        for handles, response in zip(chunks, await asyncio.gather(*(fetch(handles) for handles in chunks))):
+            if isinstance(response, FailedChunk):
+                failed.append(response)
+                continue
+
+            for handle in handles:
+                data[handle] = {name: response[alias] for name, (alias, _) in self._queries[handle].items()}
+
+        return BulkResult(self, data, failed)
@@ -0,0 +1,476 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import codec
+
+import collections
+import abc
+import hashlib
+import threading
+import sqlite3
+import json
+import time
+import typing
+import re
+
+
+__all__: typing.List[str] = [
+    "Cache",
+    "MemoryCache",
+    "SQLiteCache",
+    "cache_key",
+    "query_tags"
+]
+
+
+_FIELD = re.compile(r"(?:\w+\s*:\s*)?(\w+)\s*\(([^)]*)\)")
+_ARGUMENT = re.compile(r"(\w+)\s*:\s*(\[[^\]]*\]|[^\s,]+)")
+_TAGGED = {
+    ("nations", "id"): "nations",
+    ("nations", "alliance_id"): "alliances",
+    ("alliances", "id"): "alliances"
+}
+
+
+def cache_key(token: str, query: str, variables: dict = None) -> str:
+    """
+    Build the key a query is cached under. The api key is hashed so it is never stored.
+    """
+    key = f"{hashlib.sha256(token.encode()).hexdigest()[:16]}:{query}"
+
+    if variables:
+        key += f":{json.dumps(variables, sort_keys=True, separators=(',', ':'))}"
+
+    return key
+
+
+def query_tags(
+    query: str,
+    variables: dict = None
+) -> typing.Tuple[typing.Tuple[str, ...], typing.Set[typing.Tuple[str, int]]]:
+    """
+    Determine the fields a gql string queries and the nations and alliances it concerns.
+
+    :param query: A query formatted by utils.parse_query, or the document of a compiled query.
+    :param variables: Values for the variables of a compiled query.
+    :return: The queried fields, and a set of ("nations", id) and ("alliances", id) tags.
+    """
+    fields = []
+    tags = set()
+
+    if query.startswith("query"):
+        query = query[query.index("{"):]
+
+    for field, arguments in _FIELD.findall(query):
+        fields.append(field)
+
+        for argument, value in _ARGUMENT.findall(arguments):
+            kind = _TAGGED.get((field, argument))
+
+            if kind is None:
+                continue
+
+            if value.startswith("$"):
+                value = json.dumps((variables or {}).get(value[1:]))
+
+            for identifier in re.findall(r"\d+", value):
+                tags.add((kind, int(identifier)))
+
+    return tuple(fields), tags
+
+
+class Cache(abc.ABC):
+    """
+    Base for response caches used by api.Client.
+
+    Responses are stored encoded along with an expiry and the nations and alliances they
+    concern, so entries can be invalidated by id. Each queried field may be given its own
+    time to live.
+    """
+
+    __slots__: typing.List = [
+        "ttl",
+        "ttls",
+        "codec",
+        "hits",
+        "misses",
+        "evictions",
+        "expirations"
+    ]
+
+    def __init__(
+        self, *,
+        ttl: float = 60.0,
+        ttls: typing.Dict[str, float] = None,
+        codec: codec.Codec = codec.DEFAULT
+    ) -> None:
+        """
+        :param ttl: Seconds a response is kept for when its field has no specific time to live.
+        :param ttls: Seconds responses are kept for, by queried field such as "nations".
+        :param codec: The JSON codec responses are encoded with while stored.
+        """
+        self.ttl = ttl
+        self.ttls = ttls or {}
+        self.codec = codec
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @abc.abstractmethod
+    def get(self, key: str) -> typing.Optional[str]:
+        ...
+
+    @abc.abstractmethod
+    def set(self, key: str, value: str, ttl: float, tags: typing.Set[typing.Tuple[str, int]]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def invalidate(self, *, nation: int = None, alliance: int = None) -> int:
+        """
+        Drop every entry concerning the given nation or alliance.
+
+        :return: The number of entries dropped.
+        """
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def lookup(self, token: str, query: str, variables: dict = None) -> typing.Optional[typing.Any]:
+        """
+        Fetch the cached response to a query, if any.
+        """
+        value = self.get(cache_key(token, query, variables))
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self.codec.loads(value)
+
+    def store(self, token: str, query: str, response: typing.Any, variables: dict = None) -> None:
+        """
+        Cache the response to a query.
+        """
+        fields, tags = query_tags(query, variables)
+        ttl = min((self.ttls.get(field, self.ttl) for field in fields), default=self.ttl)
+
+        if ttl > 0:
+            self.set(cache_key(token, query, variables), self.codec.dumps(response), ttl, tags)
+
+
+class MemoryCache(Cache):
+    """
+    An in-memory cache evicting the least recently used entries once full.
+    """
+
+    __slots__: typing.List = [
+        "max_entries",
+        "max_bytes",
+        "size",
+        "_entries",
+        "_tags"
+    ]
+
+    def __init__(self, *, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, **kwargs) -> None:
+        """
+        :param max_entries: Maximum number of responses held.
+        :param max_bytes: Maximum approximate size of all encoded responses held.
+        """
+        super().__init__(**kwargs)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: typing.OrderedDict[str, tuple] = collections.OrderedDict()
+        self._tags: typing.Dict[typing.Tuple[str, int], typing.Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str) -> None:
+        _, value, tags = self._entries.pop(key)
+        self.size -= len(value)
+
+        for tag in tags:
+            keys = self._tags.get(tag)
+
+            if keys is not None:
+                keys.discard(key)
+
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> typing.Optional[str]:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            return None
+
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            self.expirations += 1
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: str, ttl: float, tags: typing.Set[typing.Tuple[str, int]]) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._drop(key)
+
+        self._entries[key] = (time.monotonic() + ttl, value, frozenset(tags))
+        self.size += len(value)
+
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, *, nation: int = None, alliance: int = None) -> int:
+        keys = set()
+
+        if nation is not None:
+            keys.update(self._tags.get(("nations", int(nation)), ()))
+
+        if alliance is not None:
+            keys.update(self._tags.get(("alliances", int(alliance)), ()))
+
+        for key in keys:
+            self._drop(key)
+
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+        self.size = 0
+
+
+class SQLiteCache(Cache):
+    """
+    A persistent cache backed by an SQLite database, surviving restarts of the process.
+
+    The database is opened in write-ahead logging mode so that any number of processes may
+    read while one writes. Lookups only read: access times are held in memory and written
+    with the next store or compaction, and expired entries are left for compaction to drop.
+    Once the stored responses outgrow the size bound, expired and then least recently used
+    entries are compacted away. The connection is shared between threads under a lock.
+    """
+
+    __slots__: typing.List = [
+        "path",
+        "max_bytes",
+        "compact_every",
+        "_connection",
+        "_lock",
+        "_accessed",
+        "_writes"
+    ]
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires REAL NOT NULL,
+            accessed REAL NOT NULL,
+            size INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            kind TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            key TEXT NOT NULL REFERENCES responses (key) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS tags_by_id ON tags (kind, id);
+        CREATE INDEX IF NOT EXISTS tags_by_key ON tags (key);
+        CREATE INDEX IF NOT EXISTS responses_by_access ON responses (accessed);
+    """
+
+    def __init__(
+        self,
+        path: str, *,
+        max_bytes: int = 256 * 1024 * 1024,
+        compact_every: int = 100,
+        timeout: float = 30.0,
+        **kwargs
+    ) -> None:
+        """
+        :param path: Path of the database file, created if it does not exist.
+        :param max_bytes: Maximum approximate size of all encoded responses stored.
+        :param compact_every: Number of writes between checks of the size bound.
+        :param timeout: Seconds to wait on a database locked by another process.
+        """
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compact_every = compact_every
+        self._writes = 0
+        self._lock = threading.RLock()
+        self._accessed: typing.Dict[str, float] = {}
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(self._SCHEMA)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._accessed:
+                with self._connection:
+                    self._connection.execute("BEGIN IMMEDIATE")
+                    self._flush()
+
+            self._connection.close()
+
+    def _flush(self) -> None:
+        """
+        Write the access times of entries read since the last write, within the caller's transaction.
+        """
+        self._connection.executemany(
+            "UPDATE responses SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()]
+        )
+        self._accessed.clear()
+
+    def get(self, key: str) -> typing.Optional[str]:
+        with self._lock:
+            row = self._connection.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+
+            if row is None:
+                return None
+
+            now = time.time()
+
+            if row[1] <= now:
+                return None
+
+            self._accessed[key] = now
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float, tags: typing.Set[typing.Tuple[str, int]]) -> None:
+        now = time.time()
+
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._flush()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now + ttl, now, len(value))
+            )
+            self._connection.execute("DELETE FROM tags WHERE key = ?", (key,))
+            self._connection.executemany(
+                "INSERT INTO tags (kind, id, key) VALUES (?, ?, ?)",
+                [(kind, identifier, key) for kind, identifier in tags]
+            )
+
+        self._writes += 1
+
+        if self._writes % self.compact_every == 0:
+            self.compact()
+
+    def compact(self) -> int:
+        """
+        Drop expired entries, then least recently used entries until within the size bound.
+
+        :return: The number of entries dropped.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._flush()
+            expired = self._connection.execute("DELETE FROM responses WHERE expires <= ?", (time.time(),)).rowcount
+            size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            evicted = 0
+
+            if size > self.max_bytes:
+                rows = self._connection.execute("SELECT key, size FROM responses ORDER BY accessed")
+                doomed = []
+
+                for key, length in rows:
+                    if size <= self.max_bytes:
+                        break
+
+                    doomed.append((key,))
+                    size -= length
+
+                self._connection.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                evicted = len(doomed)
+
+        self.expirations += expired
+        self.evictions += evicted
+
+        return expired + evicted
+
+    def invalidate(self, *, nation: int = None, alliance: int = None) -> int:
+        tags = []
+
+        if nation is not None:
+            tags.append(("nations", int(nation)))
+
+        if alliance is not None:
+            tags.append(("alliances", int(alliance)))
+
+        dropped = 0
+
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN IMMEDIATE")
+
+            for kind, identifier in tags:
+                dropped += self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM tags WHERE kind = ? AND id = ?)",
+                    (kind, identifier)
+                ).rowcount
+
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._accessed.clear()
+            self._connection.execute("DELETE FROM responses")
@@ -0,0 +1,90 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import typing
+
+try:
+    import orjson
+
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+
+except ImportError:
+    ujson = None
+
+
+__all__: typing.List[str] = [
+    "Codec",
+    "STDLIB",
+    "ORJSON",
+    "UJSON",
+    "DEFAULT",
+    "available"
+]
+
+
+class Codec:
+    """
+    A JSON implementation used to encode requests and decode responses.
+    """
+
+    __slots__: typing.List = [
+        "name",
+        "dumps",
+        "loads"
+    ]
+
+    def __init__(
+        self,
+        name: str,
+        dumps: typing.Callable[[typing.Any], str],
+        loads: typing.Callable[[typing.Union[str, bytes]], typing.Any]
+    ) -> None:
+        """
+        :param name: A name for the codec.
+        :param dumps: A function encoding an object to a JSON string.
+        :param loads: A function decoding a JSON string or UTF-8 bytes to an object.
+        """
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+
+    def __repr__(self) -> str:
+        return f"Codec({self.name!r})"
+
+
+STDLIB: Codec = Codec("json", lambda value: json.dumps(value, separators=(",", ":")), json.loads)
+ORJSON: typing.Optional[Codec] = Codec("orjson", lambda value: orjson.dumps(value).decode(), orjson.loads) if orjson else None
+UJSON: typing.Optional[Codec] = Codec("ujson", ujson.dumps, ujson.loads) if ujson else None
+DEFAULT: Codec = ORJSON or UJSON or STDLIB
+
+
+def available() -> typing.List[Codec]:
+    """
+    List every codec whose implementation is installed, fastest first.
+    """
+    return [codec for codec in (ORJSON, UJSON, STDLIB) if codec is not None]
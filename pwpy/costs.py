@@ -0,0 +1,298 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import utils
+
+import collections
+import typing
+import numpy
+
+
+__all__: typing.List[str] = [
+    "infra_cost",
+    "land_cost",
+    "city_cost",
+    "CostTable",
+    "InfraCostTable",
+    "LandCostTable"
+]
+
+
+Amounts = typing.Union[float, typing.Sequence[float], numpy.ndarray]
+
+
+def _round(amounts: numpy.ndarray, unit_cost: typing.Callable) -> numpy.ndarray:
+    """
+    Price each amount with unit_cost, rounded to cents exactly as the builtin round does.
+
+    numpy.round scales by 100 before rounding, so it can only disagree with round where the scaled
+    price lies within rounding error of half a cent. Those prices are rounded by round instead.
+    """
+    prices = unit_cost(amounts)
+    rounded = numpy.round(prices, 2)
+    scaled = prices * 100
+
+    for index in numpy.flatnonzero(numpy.abs(scaled - numpy.floor(scaled) - 0.5) < 1e-6):
+        rounded[index] = round(unit_cost(amounts[index].item()), 2)
+
+    return rounded
+
+
+def _stepped_cost(
+    starting: Amounts,
+    target: Amounts,
+    step: int,
+    refund: int,
+    unit_cost: typing.Callable
+) -> numpy.ndarray:
+    """
+    Vectorized form of the stepped purchases made by utils.infra_cost and utils.land_cost.
+
+    Every pair takes the same steps, in the same order, as the scalar function would, so that
+    each step's price is rounded and accumulated identically.
+    """
+    starting, target = numpy.broadcast_arrays(
+        numpy.asarray(starting, dtype=numpy.float64),
+        numpy.asarray(target, dtype=numpy.float64)
+    )
+    shape = starting.shape
+    starting = starting.flatten()
+    difference = target.flatten() - starting
+    cost = numpy.zeros_like(starting)
+
+    selling = difference < 0
+    cost[selling] = refund * difference[selling]
+    difference[selling] = 0
+
+    remainder = numpy.flatnonzero((difference > step) & (difference % step != 0))
+    delta = difference[remainder] % step
+    cost[remainder] += _round(starting[remainder], unit_cost) * delta
+    starting[remainder] += delta
+    difference[remainder] -= delta
+
+    steps = difference // step
+
+    for taken in range(int(steps.max(initial=0))):
+        buying = numpy.flatnonzero(steps > taken)
+        cost[buying] += _round(starting[buying], unit_cost) * step
+        starting[buying] += step
+        difference[buying] -= step
+
+    rest = numpy.flatnonzero(difference)
+    cost[rest] += _round(starting[rest], unit_cost) * difference[rest]
+
+    return cost.reshape(shape)
+
+
+def infra_cost(starting: Amounts, to_buy: Amounts) -> numpy.ndarray:
+    """
+    Calculate the cost to purchase or sell infrastructure for many pairs at once.
+
+    Gives the same results as utils.infra_cost for each pair.
+
+    :param starting: Starting infrastructure amounts.
+    :param to_buy: Desired infrastructure amounts, broadcast against starting.
+    :return: An array of the costs to purchase or sell infrastructure.
+    """
+    return _stepped_cost(starting, to_buy, 100, 150, utils.infra_unit_cost)
+
+
+def land_cost(starting: Amounts, to_buy: Amounts) -> numpy.ndarray:
+    """
+    Calculate the cost to purchase or sell land for many pairs at once.
+
+    Gives the same results as utils.land_cost for each pair.
+
+    :param starting: Starting land amounts.
+    :param to_buy: Desired land amounts, broadcast against starting.
+    :return: An array of the costs to purchase or sell land.
+    """
+    return _stepped_cost(starting, to_buy, 500, 50, utils.land_unit_cost)
+
+
+def city_cost(city: Amounts) -> numpy.ndarray:
+    """
+    Calculate the cost to purchase each of the specified cities.
+
+    Gives the same results as utils.city_cost for each city.
+
+    :param city: The cities to be purchased.
+    :return: An array of the costs to purchase each city.
+    """
+    city = numpy.asarray(city, dtype=numpy.float64) - 1
+    return 50000 * numpy.power(city - 1, 3) + 150000 * city + 75000
+
+
+class CostTable:
+    """
+    Cumulative cost tables answering stepped purchase prices in constant time.
+
+    Whole steps are always taken on the grid of amounts congruent to the target, so the table
+    holds one row of cumulative step prices, in cents, per remainder modulo the step. The cost
+    of any purchase is then its remainder step plus the difference of two row entries. Amounts
+    are tabled to 1 / scale of a unit; those off the grid or above the limit are priced by the
+    scalar function instead.
+    """
+
+    __slots__: typing.List = [
+        "step",
+        "refund",
+        "unit_cost",
+        "scalar",
+        "limit",
+        "scale",
+        "lazy",
+        "max_bytes",
+        "nbytes",
+        "_span",
+        "_length",
+        "_rows"
+    ]
+
+    def __init__(
+        self,
+        step: int,
+        refund: int,
+        unit_cost: typing.Callable,
+        scalar: typing.Callable, *,
+        limit: int,
+        scale: int = 1,
+        lazy: bool = False,
+        max_bytes: int = 4 * 1024 * 1024
+    ) -> None:
+        """
+        :param step: The number of units bought at each step.
+        :param refund: The amount refunded for each unit sold.
+        :param unit_cost: The price of a single unit at a given amount, before rounding.
+        :param scalar: The scalar cost function used for amounts outside the table.
+        :param limit: The highest amount tabled.
+        :param scale: The number of tabled amounts per unit, such as 100 to table hundredths.
+        :param lazy: Whether to build rows as they are first needed rather than all at once.
+        :param max_bytes: Maximum size of the rows held when lazy, least recently used rows being dropped.
+        """
+        self.step = step
+        self.refund = refund
+        self.unit_cost = unit_cost
+        self.scalar = scalar
+        self.limit = limit
+        self.scale = scale
+        self.lazy = lazy
+        self.max_bytes = max_bytes
+        self._span = step * scale
+        self._length = limit * scale // self._span + 2
+
+        if lazy:
+            self._rows: typing.OrderedDict[int, numpy.ndarray] = collections.OrderedDict()
+            self.nbytes = 0
+
+        else:
+            self._rows = self._build(numpy.arange(self._span))
+            self.nbytes = self._rows.nbytes
+
+    def _build(self, remainders: numpy.ndarray) -> numpy.ndarray:
+        amounts = remainders[:, None] + self._span * numpy.arange(self._length - 1)
+        prices = _round((amounts / self.scale).ravel(), self.unit_cost).reshape(amounts.shape)
+        steps = numpy.rint(prices * 100).astype(numpy.int64) * self.step
+        rows = numpy.zeros((len(remainders), self._length), dtype=numpy.int64)
+        numpy.cumsum(steps, axis=1, out=rows[:, 1:])
+        return rows
+
+    def _row(self, remainder: int) -> numpy.ndarray:
+        if not self.lazy:
+            return self._rows[remainder]
+
+        row = self._rows.get(remainder)
+
+        if row is not None:
+            self._rows.move_to_end(remainder)
+            return row
+
+        row = self._rows[remainder] = self._build(numpy.array([remainder]))[0]
+        self.nbytes += row.nbytes
+
+        while self.nbytes > self.max_bytes and len(self._rows) > 1:
+            _, dropped = self._rows.popitem(last=False)
+            self.nbytes -= dropped.nbytes
+
+        return row
+
+    def _units(self, amount: float) -> typing.Optional[int]:
+        scaled = amount * self.scale
+        units = round(scaled)
+
+        if abs(units - scaled) > 1e-6 or not 0 <= units <= self.limit * self.scale:
+            return None
+
+        return units
+
+    def cost(self, starting: float, to_buy: float) -> float:
+        """
+        Calculate the cost to purchase or sell from one amount to another.
+
+        :param starting: A starting amount.
+        :param to_buy: The desired amount.
+        :return: The cost to purchase or sell, matching the scalar function to within a cent.
+        """
+        difference = to_buy - starting
+
+        if difference < 0:
+            return self.refund * difference
+
+        first, last = self._units(starting), self._units(to_buy)
+
+        if first is None or last is None:
+            return self.scalar(starting, to_buy)
+
+        if difference <= self.step:
+            return round(self.unit_cost(starting), 2) * difference
+
+        steps, remainder = divmod(last - first, self._span)
+        row = self._row(last % self._span)
+        cost = (row[last // self._span] - row[(last - steps * self._span) // self._span]) / 100
+
+        if remainder:
+            cost += round(self.unit_cost(starting), 2) * remainder / self.scale
+
+        return cost
+
+
+class InfraCostTable(CostTable):
+    """
+    Constant time infrastructure pricing, matching utils.infra_cost.
+    """
+
+    __slots__: typing.List = []
+
+    def __init__(self, *, limit: int = 10000, **kwargs) -> None:
+        super().__init__(100, 150, utils.infra_unit_cost, utils.infra_cost, limit=limit, **kwargs)
+
+
+class LandCostTable(CostTable):
+    """
+    Constant time land pricing, matching utils.land_cost.
+    """
+
+    __slots__: typing.List = []
+
+    def __init__(self, *, limit: int = 20000, **kwargs) -> None:
+        super().__init__(500, 50, utils.land_unit_cost, utils.land_cost, limit=limit, **kwargs)
@@ -27,6 +27,8 @@ __all__ = [
     "InvalidToken",
     "InvalidQuery",
     "UnexpectedResponse",
+    "ServerError",
+    "RateLimited",
     "LoginFailure"
 ]
 
@@ -64,6 +66,21 @@ class UnexpectedResponse(PWPYException):
         self.response = response
 
 
+class ServerError(UnexpectedResponse):
+    """
+    Exception raised when the API answers with a server error, or a response that is not JSON.
+    """
+
+
+class RateLimited(PWPYException):
+    """
+    Exception raised when the API keeps refusing requests for exceeding its rate limit.
+    """
+
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = retry_after
+
+
 class LoginFailure(PWPYException):
     """
     Exception raised when the provided login credentials are invalid.
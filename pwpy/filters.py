@@ -0,0 +1,318 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import utils
+
+import datetime
+import numpy
+import typing
+
+
+__all__: typing.List[str] = [
+    "NationTable",
+    "RangeMatrix",
+    "range_matrix",
+    "flatten",
+    "not_beige",
+    "open_defensive_slot",
+    "fully_powered",
+    "omit_alliance",
+    "war_range",
+    "military_strength",
+    "weakness",
+    "inactivity"
+]
+
+
+Predicate = typing.Callable[["NationTable"], numpy.ndarray]
+Ranker = typing.Callable[["NationTable"], numpy.ndarray]
+
+
+def flatten(records: typing.Sequence[dict], key: str) -> typing.Tuple[numpy.ndarray, typing.List[dict]]:
+    """
+    Flatten a nested list of every record, returning the index of each item's owner alongside it.
+
+    :param records: Records holding a nested list, such as nations and their "cities".
+    :param key: The key of the nested list.
+    :return: The index of the owning record of each item, and the items, in order.
+    """
+    counts = numpy.fromiter((len(record.get(key) or ()) for record in records), dtype=numpy.int64, count=len(records))
+    items = [item for record in records for item in record.get(key) or ()]
+    return numpy.repeat(numpy.arange(len(records)), counts), items
+
+
+def _beige(table: "NationTable") -> numpy.ndarray:
+    return numpy.fromiter((record["color"] == "beige" for record in table.records), dtype=bool, count=len(table))
+
+
+def _ongoing(table: "NationTable", key: str) -> numpy.ndarray:
+    """
+    Count the ongoing wars in each nation's list of wars under key, as utils.sort_ongoing_wars would find them.
+    """
+    owners, wars = flatten(table.records, key)
+    turns_left = numpy.fromiter((int(war["turns_left"]) for war in wars), dtype=numpy.int64, count=len(wars))
+    winner = numpy.fromiter((int(war["winner"]) for war in wars), dtype=numpy.int64, count=len(wars))
+    ongoing = (turns_left > 0) & (winner == 0)
+    return numpy.bincount(owners[ongoing], minlength=len(table))
+
+
+def _unpowered_cities(table: "NationTable") -> numpy.ndarray:
+    owners, cities = flatten(table.records, "cities")
+    powered = numpy.fromiter((bool(city["powered"]) for city in cities), dtype=bool, count=len(cities))
+    return numpy.bincount(owners[~powered], minlength=len(table))
+
+
+def _last_active(table: "NationTable") -> numpy.ndarray:
+    return numpy.fromiter(
+        (datetime.datetime.fromisoformat(record["last_active"]).timestamp() for record in table.records),
+        dtype=numpy.float64, count=len(table)
+    )
+
+
+class NationTable:
+    """
+    A columnar view over a list of nations for filtering them with vectorized predicates.
+
+    Columns are built from the records on first access and kept for reuse. Besides any
+    numeric field of the nations, the derived columns "beige", "ongoing_defensive",
+    "ongoing_offensive", "unpowered_cities" and "last_active_timestamp" are available.
+    """
+
+    __slots__: typing.List = [
+        "records",
+        "_columns"
+    ]
+
+    derived: typing.Dict[str, typing.Callable[["NationTable"], numpy.ndarray]] = {
+        "beige": _beige,
+        "ongoing_defensive": lambda table: _ongoing(table, "defensive_wars"),
+        "ongoing_offensive": lambda table: _ongoing(table, "offensive_wars"),
+        "unpowered_cities": _unpowered_cities,
+        "last_active_timestamp": _last_active
+    }
+
+    def __init__(self, records: typing.Sequence[dict], columns: typing.Dict[str, numpy.ndarray] = None) -> None:
+        """
+        :param records: Nations as returned by the gql api.
+        :param columns: Columns already built for the records, by name, to be used rather than rebuilt.
+        """
+        self.records = records
+        self._columns: typing.Dict[str, numpy.ndarray] = dict(columns or {})
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, name: str) -> numpy.ndarray:
+        column = self._columns.get(name)
+
+        if column is None:
+            builder = self.derived.get(name)
+
+            if builder is not None:
+                column = builder(self)
+
+            else:
+                column = numpy.fromiter(
+                    (float(record[name] or 0) for record in self.records), dtype=numpy.float64, count=len(self)
+                )
+
+            self._columns[name] = column
+
+        return column
+
+    def mask(self, *predicates: Predicate) -> numpy.ndarray:
+        """
+        Combine predicates into a single mask of the nations satisfying all of them.
+        """
+        mask = numpy.ones(len(self), dtype=bool)
+
+        for predicate in predicates:
+            mask &= predicate(self)
+
+        return mask
+
+    def filter(self, *predicates: Predicate) -> typing.List[dict]:
+        """
+        Return the nations satisfying every predicate, in their original order.
+        """
+        return [self.records[index] for index in numpy.flatnonzero(self.mask(*predicates))]
+
+
+class RangeMatrix:
+    """
+    Which defenders each attacker may declare war on, by score.
+
+    Both sides are sorted by score, so the defenders within range of an attacker form a
+    contiguous run of the sorted defenders, stored as a start and stop index per attacker.
+    """
+
+    __slots__: typing.List = [
+        "attackers",
+        "defenders",
+        "starts",
+        "stops",
+        "offensive_slots",
+        "defensive_slots"
+    ]
+
+    def __init__(
+        self,
+        attackers: NationTable,
+        defenders: NationTable,
+        starts: numpy.ndarray,
+        stops: numpy.ndarray
+    ) -> None:
+        self.attackers = attackers
+        self.defenders = defenders
+        self.starts = starts
+        self.stops = stops
+        self.offensive_slots = numpy.maximum(5 - attackers["ongoing_offensive"], 0)
+        self.defensive_slots = numpy.maximum(3 - defenders["ongoing_defensive"], 0)
+
+    def __len__(self) -> int:
+        return len(self.attackers)
+
+    @property
+    def counts(self) -> numpy.ndarray:
+        """
+        Number of defenders within range of each attacker.
+        """
+        return self.stops - self.starts
+
+    def targets(self, attacker: int, *, open_slots: bool = False) -> typing.List[dict]:
+        """
+        Lookup the defenders within range of an attacker.
+
+        :param attacker: Index of the attacker in the sorted attackers.
+        :param open_slots: Whether to only include defenders with a free defensive slot.
+        :return: A list of defenders, lowest score first.
+        """
+        start, stop = int(self.starts[attacker]), int(self.stops[attacker])
+        indices = numpy.arange(start, stop)
+
+        if open_slots:
+            indices = indices[self.defensive_slots[start:stop] > 0]
+
+        return [self.defenders.records[index] for index in indices]
+
+    def adjacency(self) -> typing.Dict[int, typing.List[int]]:
+        """
+        Map the id of every attacker to the ids of the defenders within its range.
+        """
+        attackers = self.attackers["id"].astype(numpy.int64)
+        defenders = self.defenders["id"].astype(numpy.int64)
+
+        return {
+            int(attacker): defenders[start:stop].tolist()
+            for attacker, start, stop in zip(attackers, self.starts, self.stops)
+        }
+
+
+def range_matrix(attackers: typing.Sequence[dict], defenders: typing.Sequence[dict]) -> RangeMatrix:
+    """
+    Compute which defenders fall within the war range of each attacker.
+
+    :param attackers: Nations declaring war. Each must carry "score" and "offensive_wars".
+    :param defenders: Nations being declared upon. Each must carry "score" and "defensive_wars".
+    :return: A range matrix over both sides sorted by score.
+    """
+    attackers = sorted(attackers, key=lambda nation: float(nation["score"]))
+    defenders = sorted(defenders, key=lambda nation: float(nation["score"]))
+    attackers, defenders = NationTable(attackers), NationTable(defenders)
+
+    # with both sides sorted the range bounds only ever move forward, so this is a merge of sorted arrays
+    scores = defenders["score"]
+    min_scores, max_scores = utils.score_range(attackers["score"])
+    starts = numpy.searchsorted(scores, min_scores, side="left")
+    stops = numpy.searchsorted(scores, max_scores, side="right")
+
+    return RangeMatrix(attackers, defenders, starts, stops)
+
+
+def not_beige(table: NationTable) -> numpy.ndarray:
+    return ~table["beige"]
+
+
+def open_defensive_slot(table: NationTable) -> numpy.ndarray:
+    return table["ongoing_defensive"] < 3
+
+
+def fully_powered(table: NationTable) -> numpy.ndarray:
+    return table["unpowered_cities"] == 0
+
+
+def omit_alliance(alliance: int) -> Predicate:
+    """
+    Build a predicate excluding the members of an alliance.
+    """
+    def predicate(table: NationTable) -> numpy.ndarray:
+        return table["alliance_id"] != int(alliance)
+
+    return predicate
+
+
+def war_range(*, powered: bool = True, omit: int = None) -> typing.List[Predicate]:
+    """
+    Build the predicates used when searching for war targets.
+
+    :param powered: Whether to discriminate against unpowered cities.
+    :param omit: An alliance to be omitted from the results.
+    :return: A list of predicates to be passed to NationTable.filter.
+    """
+    predicates = [not_beige, open_defensive_slot]
+
+    if omit:
+        predicates.append(omit_alliance(omit))
+
+    if powered:
+        predicates.append(fully_powered)
+
+    return predicates
+
+
+def military_strength(table: NationTable) -> numpy.ndarray:
+    """
+    Rank nations by the score their military units are worth.
+    """
+    return (
+        table["soldiers"] * 0.0004
+        + table["tanks"] * 0.025
+        + table["aircraft"] * 0.3
+        + table["ships"] * 1
+        + table["missiles"] * 5
+        + table["nukes"] * 15
+    )
+
+
+def weakness(table: NationTable) -> numpy.ndarray:
+    """
+    Rank nations with the weakest military first.
+    """
+    return -military_strength(table)
+
+
+def inactivity(table: NationTable) -> numpy.ndarray:
+    """
+    Rank nations by how long ago they were last active, the longest first.
+    """
+    return datetime.datetime.now(datetime.timezone.utc).timestamp() - table["last_active_timestamp"]
@@ -0,0 +1,200 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import api, utils, filters, queries
+
+import bisect
+import typing
+import numpy
+
+
+__all__: typing.List[str] = [
+    "NationIndex"
+]
+
+
+class NationIndex:
+    """
+    A local index of nations kept sorted by score.
+
+    Score ranges are answered with a binary search over the sorted scores, so war range
+    lookups never touch the network. The columns the war range predicates read are built
+    when nations are loaded or updated and kept in score order beside them, so a lookup is
+    a slice of each column and a vectorized mask. The index is filled from a bulk snapshot
+    with :meth:`refresh` and kept current by passing changed nations to :meth:`update`.
+    """
+
+    __slots__: typing.List = [
+        "_keys",
+        "_nations",
+        "_scores",
+        "_records",
+        "_columns"
+    ]
+
+    # columns read by filters.war_range and the alliance filter, prebuilt in score order
+    columns: typing.Tuple[str, ...] = ("beige", "ongoing_defensive", "unpowered_cities", "alliance_id")
+
+    def __init__(self, nations: typing.Iterable[dict] = ()) -> None:
+        """
+        :param nations: Nations to fill the index with. Each must carry "id", "score", "color" and
+            "alliance_id", and should carry "defensive_wars" and "cities" as in queries.WAR_RANGE_FIELDS.
+        """
+        self._nations: typing.Dict[int, dict] = {}
+        self._scores: typing.Dict[int, float] = {}
+        self._keys: typing.List[typing.Tuple[float, int]] = []
+        self._records: typing.List[dict] = []
+        self._columns: typing.Dict[str, numpy.ndarray] = {}
+        self.load(nations)
+
+    def __len__(self) -> int:
+        return len(self._nations)
+
+    def __contains__(self, nation: int) -> bool:
+        return int(nation) in self._nations
+
+    def _build(self, records: typing.Sequence[dict]) -> typing.Dict[str, numpy.ndarray]:
+        table = filters.NationTable(records)
+        return {name: table[name] for name in self.columns}
+
+    def load(self, nations: typing.Iterable[dict]) -> None:
+        """
+        Replace the contents of the index with the given nations.
+        """
+        self._nations = {int(nation["id"]): nation for nation in nations}
+        self._scores = {identifier: float(nation["score"]) for identifier, nation in self._nations.items()}
+        self._keys = sorted((score, identifier) for identifier, score in self._scores.items())
+        self._records = [self._nations[identifier] for _, identifier in self._keys]
+        self._columns = self._build(self._records)
+
+    def get(self, nation: int) -> typing.Optional[dict]:
+        return self._nations.get(int(nation))
+
+    def update(self, nation: dict) -> None:
+        """
+        Insert a nation, or replace it if already indexed.
+        """
+        identifier = int(nation["id"])
+
+        if identifier in self._nations:
+            self.remove(identifier)
+
+        key = (float(nation["score"]), identifier)
+        position = bisect.bisect_left(self._keys, key)
+        row = self._build([nation])
+
+        self._nations[identifier] = nation
+        self._scores[identifier] = key[0]
+        self._keys.insert(position, key)
+        self._records.insert(position, nation)
+
+        for name, column in self._columns.items():
+            self._columns[name] = numpy.insert(column, position, row[name])
+
+    def remove(self, nation: int) -> typing.Optional[dict]:
+        """
+        Remove a nation from the index.
+
+        :return: The removed nation, or None if it was not indexed.
+        """
+        identifier = int(nation)
+        removed = self._nations.pop(identifier, None)
+
+        if removed is not None:
+            # the nation may have been changed in place since, so it is found by the score it was indexed under
+            key = (self._scores.pop(identifier), identifier)
+            position = bisect.bisect_left(self._keys, key)
+            assert self._keys[position] == key, "index out of sync with its nations"
+
+            del self._keys[position]
+            del self._records[position]
+
+            for name, column in self._columns.items():
+                self._columns[name] = numpy.delete(column, position)
+
+        return removed
+
+    def _bounds(self, min_score: float, max_score: float) -> typing.Tuple[int, int]:
+        start = bisect.bisect_left(self._keys, (min_score, -1))
+        stop = bisect.bisect_right(self._keys, (max_score, float("inf")))
+        return start, stop
+
+    def between(self, min_score: float, max_score: float) -> typing.List[dict]:
+        """
+        Lookup every nation with a score in the given inclusive range, lowest first.
+        """
+        start, stop = self._bounds(min_score, max_score)
+        return self._records[start:stop]
+
+    def within_war_range(
+        self,
+        score: float, *,
+        alliance: int = None,
+        powered: bool = True,
+        omit_alliance: int = None,
+        predicates: typing.Iterable[filters.Predicate] = ()
+    ) -> typing.List[dict]:
+        """
+        Lookup all indexed targets for a given score, as queries.within_war_range would.
+
+        :param score: Score to be calculated with.
+        :param alliance: Target alliance to narrow the search.
+        :param powered: Whether to discriminate against unpowered cities. Defaults to True.
+        :param omit_alliance: An alliance to be omitted from search results.
+        :param predicates: Additional predicates from pwpy.filters that targets must satisfy.
+        :return: A list of nations that fall within the provided search criteria, lowest score first.
+        """
+        start, stop = self._bounds(*utils.score_range(score))
+        records = self._records[start:stop]
+        table = filters.NationTable(records, {name: column[start:stop] for name, column in self._columns.items()})
+        checks = [*filters.war_range(powered=powered, omit=omit_alliance), *predicates]
+
+        if alliance:
+            checks.append(lambda columns: columns["alliance_id"] == int(alliance))
+
+        return [records[index] for index in numpy.flatnonzero(table.mask(*checks))]
+
+    async def refresh(
+        self, *,
+        fields: typing.Iterable = queries.WAR_RANGE_FIELDS,
+        args: dict = None,
+        prefetch: int = 4,
+        token: str = None,
+        client: api.Client = None
+    ) -> None:
+        """
+        Replace the contents of the index with a fresh snapshot of every nation.
+
+        :param fields: The fields to fetch for each nation. Must include "id" and "score".
+        :param args: Arguments to filter nations by. Defaults to nations not in vacation mode.
+        :param prefetch: Number of pages fetched ahead at most.
+        :param token: A valid Politics and War API key.
+        :param client: A client to send the queries with.
+        """
+        args = {"vacation_mode": False} if args is None else args
+        nations = [
+            nation async for nation in queries.iter_nations(
+                fields, args=args, prefetch=prefetch, token=token, client=client
+            )
+        ]
+        self.load(nations)
@@ -0,0 +1,185 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import api, queries
+
+import asyncio
+import typing
+
+
+__all__: typing.List[str] = [
+    "Loader",
+    "NationLoader",
+    "AllianceLoader"
+]
+
+
+class Loader:
+    """
+    Batches lookups of single records by id.
+
+    Ids requested within the same event loop tick, or within a short window, are fetched
+    together with a single query and each caller receives its own record.
+    """
+
+    __slots__: typing.List = [
+        "field",
+        "fields",
+        "query",
+        "window",
+        "max_batch",
+        "token",
+        "client",
+        "batches",
+        "loaded",
+        "_pending",
+        "_handle",
+        "_tasks"
+    ]
+
+    def __init__(
+        self,
+        field: str,
+        fields: typing.Iterable, *,
+        window: float = 0.0,
+        max_batch: int = 500,
+        token: str = None,
+        client: api.Client = None
+    ) -> None:
+        """
+        :param field: The paginated field to look records up on, such as "nations".
+        :param fields: The fields to fetch for each record. "id" is always fetched.
+        :param window: Seconds to wait for more ids before dispatching. Defaults to the current tick.
+        :param max_batch: Maximum number of ids fetched by a single query.
+        :param token: A valid Politics and War API key.
+        :param client: A client to send the queries with.
+        """
+        fields = tuple(fields)
+
+        self.field = field
+        self.fields = fields if "id" in fields else ("id", *fields)
+        self.query = api.CompiledQuery("Load", {
+            field: {"args": {"id": "$id", "first": "$first"}, "variables": {"data": self.fields}}
+        }, {"id": "[Int]", "first": "Int"})
+        self.window = window
+        self.max_batch = max_batch
+        self.token = token
+        self.client = client
+        self.batches = 0
+        self.loaded = 0
+        self._pending: typing.Dict[int, asyncio.Future] = {}
+        self._handle: typing.Optional[asyncio.Handle] = None
+        self._tasks: typing.Set[asyncio.Task] = set()
+
+    def load(self, record: int) -> "asyncio.Future[typing.Optional[dict]]":
+        """
+        Request a record by id.
+
+        :param record: The id of the record to be fetched.
+        :return: A future resolving to the record, or None if no such record exists.
+        """
+        record = int(record)
+        future = self._pending.get(record)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[record] = loop.create_future()
+
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+
+            elif self._handle is None:
+                if self.window > 0:
+                    self._handle = loop.call_later(self.window, self._dispatch)
+
+                else:
+                    self._handle = loop.call_soon(self._dispatch)
+
+        return future
+
+    async def load_many(self, records: typing.Iterable[int]) -> typing.List[typing.Optional[dict]]:
+        """
+        Request several records by id.
+
+        :param records: The ids of the records to be fetched.
+        :return: The records in the order requested, None where no such record exists.
+        """
+        return list(await asyncio.gather(*(self.load(record) for record in records)))
+
+    def _dispatch(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            task = asyncio.ensure_future(self._fetch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: typing.Dict[int, asyncio.Future]) -> None:
+        variables = {"id": list(batch), "first": len(batch)}
+        self.batches += 1
+
+        try:
+            response = await api.fetch_query(self.query, variables=variables, token=self.token, client=self.client)
+
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+
+            return
+
+        for record in response[self.field]["data"]:
+            future = batch.get(int(record["id"]))
+
+            if future is not None and not future.done():
+                future.set_result(record)
+                self.loaded += 1
+
+        for future in batch.values():
+            if not future.done():
+                future.set_result(None)
+
+
+class NationLoader(Loader):
+    """
+    Batches lookups of nations by id.
+    """
+
+    __slots__: typing.List = []
+
+    def __init__(self, fields: typing.Iterable = queries.NATION_FIELDS, **kwargs) -> None:
+        super().__init__("nations", fields, **kwargs)
+
+
+class AllianceLoader(Loader):
+    """
+    Batches lookups of alliances by id.
+    """
+
+    __slots__: typing.List = []
+
+    def __init__(self, fields: typing.Iterable = queries.ALLIANCE_FIELDS, **kwargs) -> None:
+        super().__init__("alliances", fields, **kwargs)
@@ -0,0 +1,420 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import typing
+import types
+import sys
+
+
+__all__: typing.List[str] = [
+    "Record",
+    "Nation",
+    "Alliance",
+    "City",
+    "War",
+    "BankContents",
+    "convert"
+]
+
+
+_SCALARS = (int, float, str, bool)
+
+
+class _Packed:
+    """
+    A list of nested records sharing the same fields, packed as value tuples until decoded.
+    """
+
+    __slots__: typing.List = [
+        "keys",
+        "rows"
+    ]
+
+    def __init__(self, keys: typing.Tuple[str, ...], rows: typing.List[tuple]) -> None:
+        self.keys = keys
+        self.rows = rows
+
+    @classmethod
+    def pack(cls, items: typing.List[dict]) -> typing.Union["_Packed", typing.List[dict]]:
+        keys = tuple(items[0])
+
+        if any(len(item) != len(keys) or tuple(item) != keys for item in items):
+            return items
+
+        return cls(keys, [tuple(item.values()) for item in items])
+
+
+class _Lazy:
+    """
+    Descriptor decoding a nested record, or list of records, on first access.
+    """
+
+    __slots__: typing.List = [
+        "name",
+        "slot",
+        "kind",
+        "many"
+    ]
+
+    def __init__(self, name: str, kind: str, many: bool) -> None:
+        self.name = name
+        self.slot = f"_{name}"
+        self.kind = kind
+        self.many = many
+
+    def __get__(self, instance: typing.Optional["Record"], owner: type) -> typing.Any:
+        if instance is None:
+            return self
+
+        value = getattr(instance, self.slot)
+        kind = globals()[self.kind]
+
+        if isinstance(value, dict):
+            value = kind(value)
+            setattr(instance, self.slot, value)
+
+        elif isinstance(value, _Packed):
+            value = [kind(dict(zip(value.keys, row))) for row in value.rows]
+            setattr(instance, self.slot, value)
+
+        elif self.many and value and isinstance(value[0], dict):
+            value = [kind(item) for item in value]
+            setattr(instance, self.slot, value)
+
+        return value
+
+    def __set__(self, instance: "Record", value: typing.Any) -> None:
+        if self.many and value and isinstance(value, list) and isinstance(value[0], dict):
+            value = _Packed.pack(value)
+
+        setattr(instance, self.slot, value)
+
+
+class Record:
+    """
+    Base for typed, slotted records built from gql api responses.
+
+    Each distinct set of fetched fields gets its own slotted layout holding exactly those
+    fields, so a record costs a fraction of the dict it was built from. Reading a field that
+    was not fetched raises AttributeError. Scalars are converted to their annotated type,
+    strings are interned, and nested records are kept as returned until first accessed.
+    Records may also be read like dicts.
+    """
+
+    __slots__: typing.Tuple = ()
+
+    _nested: typing.ClassVar[typing.Dict[str, typing.Tuple[str, bool]]] = {}
+    _converters: typing.ClassVar[typing.Dict[str, type]] = {}
+    _layouts: typing.ClassVar[typing.Dict[typing.Tuple[str, ...], type]] = {}
+    _declared: typing.ClassVar[type] = None
+    _keys: typing.ClassVar[typing.Tuple[str, ...]] = ()
+
+    def __init_subclass__(cls, layout: bool = False, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+
+        if layout:
+            return
+
+        annotations = cls.__dict__.get("__annotations__", {})
+        cls._converters = {name: kind for name, kind in annotations.items() if kind in _SCALARS}
+        cls._layouts = {}
+        cls._declared = cls
+
+        for name, (kind, many) in cls._nested.items():
+            setattr(cls, name, _Lazy(name, kind, many))
+
+    def __new__(cls, data: dict) -> "Record":
+        cls = cls._declared
+        keys = tuple(data)
+        layout = cls._layouts.get(keys)
+
+        if layout is None:
+            slots = tuple(f"_{key}" if key in cls._nested else key for key in keys)
+            layout = cls._layouts[keys] = types.new_class(
+                cls.__name__, (cls,), {"layout": True},
+                lambda namespace: namespace.update(__slots__=slots, _keys=keys, __qualname__=cls.__qualname__)
+            )
+
+        return object.__new__(layout)
+
+    def __init__(self, data: dict) -> None:
+        """
+        :param data: A record as returned by the gql api.
+        """
+        for key, value in data.items():
+            converter = self._converters.get(key)
+
+            if converter is not None and value is not None and not isinstance(value, converter):
+                value = converter(value)
+
+            if isinstance(value, str):
+                value = sys.intern(value)
+
+            setattr(self, key, value)
+
+    def __getitem__(self, key: str) -> typing.Any:
+        if key not in self._keys:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __reduce__(self) -> tuple:
+        return self._declared, (self.to_dict(),)
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        return getattr(self, key) if key in self._keys else default
+
+    def keys(self) -> typing.Tuple[str, ...]:
+        return self._keys
+
+    def to_dict(self) -> dict:
+        """
+        Rebuild the record as the dict it was built from.
+        """
+        def unwrap(value):
+            if isinstance(value, Record):
+                return value.to_dict()
+
+            if isinstance(value, list):
+                return [unwrap(item) for item in value]
+
+            return value
+
+        return {key: unwrap(getattr(self, key)) for key in self._keys}
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if isinstance(other, Record):
+            return self._declared is other._declared and self.to_dict() == other.to_dict()
+
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        shown = ", ".join(f"{key}={getattr(self, key)!r}" for key in self._keys[:3])
+        return f"{type(self).__name__}({shown})"
+
+
+class City(Record):
+
+    id: int
+    name: str
+    date: str
+    infrastructure: float
+    land: float
+    powered: bool
+    nation_id: int
+
+    __slots__ = ()
+
+
+class War(Record):
+
+    id: int
+    date: str
+    reason: str
+    war_type: str
+    turns_left: int
+    winner: int
+    attacker_id: int
+    defender_id: int
+    att_alliance_id: int
+    def_alliance_id: int
+
+    __slots__ = ()
+
+
+class BankContents(Record):
+
+    id: int
+    money: float
+    coal: float
+    uranium: float
+    iron: float
+    bauxite: float
+    steel: float
+    gasoline: float
+    munitions: float
+    oil: float
+    food: float
+    aluminum: float
+
+    __slots__ = ()
+
+
+class Alliance(Record):
+
+    id: int
+    name: str
+    acronym: str
+    score: float
+    color: str
+    date: str
+    average_score: float
+    accept_members: bool
+    discord_link: str
+    forum_link: str
+    wiki_link: str
+    flag: str
+    money: float
+    coal: float
+    uranium: float
+    iron: float
+    bauxite: float
+    steel: float
+    gasoline: float
+    munitions: float
+    oil: float
+    food: float
+    aluminum: float
+
+    __slots__ = ()
+
+
+class Nation(Record):
+
+    _nested = {
+        "alliance": ("Alliance", False),
+        "cities": ("City", True),
+        "offensive_wars": ("War", True),
+        "defensive_wars": ("War", True)
+    }
+
+    id: int
+    nation_name: str
+    leader_name: str
+    alliance_id: int
+    alliance_position: str
+    alliance_position_info: typing.Any
+    alliance: Alliance
+    continent: str
+    war_policy: str
+    domestic_policy: str
+    color: str
+    num_cities: int
+    score: float
+    update_tz: float
+    population: int
+    flag: str
+    vacation_mode_turns: int
+    beige_turns: int
+    espionage_available: bool
+    last_active: str
+    date: str
+    soldiers: int
+    tanks: int
+    aircraft: int
+    ships: int
+    missiles: int
+    nukes: int
+    discord: str
+    discord_id: str
+    turns_since_last_city: int
+    turns_since_last_project: int
+    projects: int
+    project_bits: str
+    iron_works: bool
+    bauxite_works: bool
+    arms_stockpile: bool
+    emergency_gasoline_reserve: bool
+    mass_irrigation: bool
+    international_trade_center: bool
+    missile_launch_pad: bool
+    nuclear_research_facility: bool
+    iron_dome: bool
+    vital_defense_system: bool
+    central_intelligence_agency: bool
+    center_for_civil_engineering: bool
+    propaganda_bureau: bool
+    uranium_enrichment_program: bool
+    urban_planning: bool
+    advanced_urban_planning: bool
+    space_program: bool
+    spy_satellite: bool
+    moon_landing: bool
+    pirate_economy: bool
+    recycling_initiative: bool
+    telecommunications_satellite: bool
+    green_technologies: bool
+    arable_land_agency: bool
+    clinical_research_center: bool
+    specialized_police_training_program: bool
+    advanced_engineering_corps: bool
+    government_support_agency: bool
+    research_and_development_center: bool
+    resource_production_center: bool
+    metropolitan_planning: bool
+    military_salvage: bool
+    fallout_shelter: bool
+    wars_won: int
+    wars_lost: int
+    tax_id: int
+    alliance_seniority: int
+    gross_national_income: float
+    gross_domestic_product: float
+    soldier_casualties: int
+    soldier_kills: int
+    tank_casualties: int
+    tank_kills: int
+    aircraft_casualties: int
+    aircraft_kills: int
+    ship_casualties: int
+    ship_kills: int
+    missile_casualties: int
+    missile_kills: int
+    nuke_casualties: int
+    nuke_kills: int
+    money_looted: float
+    vip: bool
+    money: float
+    coal: float
+    uranium: float
+    iron: float
+    bauxite: float
+    steel: float
+    gasoline: float
+    munitions: float
+    oil: float
+    food: float
+    aluminum: float
+    cities: typing.List[City]
+    offensive_wars: typing.List[War]
+    defensive_wars: typing.List[War]
+
+    __slots__ = ()
+
+
+_RecordType = typing.TypeVar("_RecordType", bound=Record)
+
+
+def convert(kind: typing.Type[_RecordType], data: typing.List[dict], records: bool) -> list:
+    """
+    Convert records returned by the gql api to the given record type when requested.
+
+    :param kind: The record type to convert to.
+    :param data: Records as returned by the gql api.
+    :param records: Whether to convert, returning data unchanged otherwise.
+    :return: A list of records, or data.
+    """
+    return [kind(item) for item in data] if records else data
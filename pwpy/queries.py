@@ -15,26 +15,284 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from pwpy import api, utils
+from pwpy import api, utils, exceptions, filters, models, costs
+
+import collections
+import asyncio
+import typing
+import heapq
+import numpy
 
 
 __all__ = [
     "within_war_range",
+    "alliance_war_ranges",
     "nations_pages",
+    "iter_nations",
+    "iter_nation_pages",
     "nation_details",
+    "nation_military",
+    "nation_discord",
     "nation_bank_contents",
     "alliances_pages",
+    "iter_alliances",
     "alliance_details",
-    "alliance_bank_contents"
+    "alliances_details",
+    "alliance_military",
+    "alliance_discord",
+    "alliance_bank_contents",
+    "alliances_bank_contents",
+    "alliance_rebuild_cost",
+    "poll"
 ]
 
 
+NATION_FIELDS: tuple = (
+    "id",
+    "nation_name",
+    "leader_name",
+    "alliance_id",
+    "color",
+    "num_cities",
+    "score",
+    "last_active"
+)
+
+ALLIANCE_FIELDS: tuple = (
+    "id",
+    "name",
+    "acronym",
+    "score",
+    "color"
+)
+
+
+async def _iter_page_data(
+    field: str,
+    fields: typing.Iterable,
+    args: typing.Optional[dict],
+    first: int,
+    prefetch: int,
+    token: str,
+    client: typing.Optional[api.Client]
+) -> typing.AsyncIterator[typing.List[dict]]:
+    """
+    Yield every page of a paginated field, fetching up to prefetch pages ahead of the caller.
+    """
+    if client is None:
+        async with api.Client(token) as client:
+            async for page in _iter_page_data(field, fields, args, first, prefetch, token, client):
+                yield page
+
+        return
+
+    fields = tuple(fields)
+    arguments = {**(args or {}), "first": "$first", "page": "$page"}
+    variables = {"first": "Int", "page": "Int"}
+    first_page = api.CompiledQuery("FirstPage", {
+        field: {"args": arguments, "variables": {"data": fields, "paginatorInfo": ("lastPage",)}}
+    }, variables)
+    next_page = api.CompiledQuery("NextPage", {field: {"args": arguments, "variables": {"data": fields}}}, variables)
+
+    def fetch_page(query: api.CompiledQuery, page: int) -> typing.Awaitable[dict]:
+        return client.fetch_query(query, variables={"first": first, "page": page}, token=token)
+
+    response = await fetch_page(first_page, 1)
+    last_page = response[field]["paginatorInfo"]["lastPage"]
+    pending = collections.deque()
+    following = 2
+
+    try:
+        yield response[field]["data"]
+
+        del response
+
+        while pending or following <= last_page:
+            while following <= last_page and len(pending) < max(prefetch, 1):
+                pending.append(asyncio.create_task(fetch_page(next_page, following)))
+                following += 1
+
+            response = await pending.popleft()
+            yield response[field]["data"]
+
+            del response
+
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _stream_pages(
+    field: str,
+    fields: typing.Iterable,
+    args: typing.Optional[dict],
+    first: int,
+    prefetch: int,
+    token: str,
+    client: typing.Optional[api.Client]
+) -> typing.AsyncIterator[dict]:
+    """
+    Yield every record of a paginated field as it is decoded, streaming up to prefetch pages ahead of the caller.
+    """
+    if client is None:
+        async with api.Client(token) as client:
+            async for record in _stream_pages(field, fields, args, first, prefetch, token, client):
+                yield record
+
+        return
+
+    fields = tuple(fields)
+    arguments = {**(args or {}), "first": "$first", "page": "$page"}
+    variables = {"first": "Int", "page": "Int"}
+    # paginatorInfo is selected first so the last page is known before any record arrives
+    first_page = api.CompiledQuery("FirstPage", {
+        field: {"args": arguments, "variables": {"paginatorInfo": ("lastPage",), "data": fields}}
+    }, variables)
+    next_page = api.CompiledQuery("NextPage", {field: {"args": arguments, "variables": {"data": fields}}}, variables)
+    end = object()
+
+    async def pump(query: api.CompiledQuery, page: int, queue: asyncio.Queue, extras: dict) -> None:
+        try:
+            records = client.stream_query(
+                query, field, variables={"first": first, "page": page}, token=token, extras=extras
+            )
+
+            async for record in records:
+                await queue.put(record)
+
+        except Exception as exc:
+            await queue.put(exc)
+
+        else:
+            await queue.put(end)
+
+    def start(query: api.CompiledQuery, page: int) -> tuple:
+        queue, extras = asyncio.Queue(maxsize=first), {}
+        return asyncio.create_task(pump(query, page, queue, extras)), queue, extras
+
+    pending = collections.deque([start(first_page, 1)])
+    last_page = None
+    following = 2
+
+    try:
+        while pending:
+            _, queue, extras = pending[0]
+
+            while True:
+                record = await queue.get()
+
+                if last_page is None and ("data", field, "paginatorInfo") in extras:
+                    last_page = extras[("data", field, "paginatorInfo")]["lastPage"]
+
+                while last_page is not None and following <= last_page and len(pending) <= max(prefetch, 1):
+                    pending.append(start(next_page, following))
+                    following += 1
+
+                if record is end:
+                    break
+
+                if isinstance(record, Exception):
+                    raise record
+
+                yield record
+
+            pending.popleft()
+
+    finally:
+        for task, *_ in pending:
+            task.cancel()
+
+
+async def _batched(records: typing.AsyncIterator[dict], size: int) -> typing.AsyncIterator[typing.List[dict]]:
+    """
+    Group records into lists of up to size records as they arrive.
+    """
+    batch = []
+
+    async for record in records:
+        batch.append(record)
+
+        if len(batch) >= size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def _iter_pages(
+    field: str,
+    fields: typing.Iterable,
+    args: typing.Optional[dict],
+    first: int,
+    prefetch: int,
+    token: str,
+    client: typing.Optional[api.Client]
+) -> typing.AsyncIterator[dict]:
+    """
+    Yield every record of a paginated field, page by page.
+    """
+    async for page in _iter_page_data(field, fields, args, first, prefetch, token, client):
+        for record in page:
+            yield record
+
+
+async def _first_page(
+    field: str,
+    fields: typing.Iterable,
+    args: dict,
+    first: int,
+    token: str,
+    client: typing.Optional[api.Client]
+) -> typing.AsyncIterator[typing.List[dict]]:
+    """
+    Yield only the first page of a paginated field.
+    """
+    query = {field: {"args": {**args, "first": first}, "variables": {"data": fields}}}
+    response = await api.fetch_query(query, token=token, client=client)
+    yield response[field]["data"]
+
+
+WAR_RANGE_FIELDS: tuple = (
+    "id",
+    "nation_name",
+    "leader_name",
+    "color",
+    "alliance_id",
+    "alliance_position",
+    {"alliance": ("name", "score")},
+    "war_policy",
+    "flag",
+    "num_cities",
+    "score",
+    "espionage_available",
+    "last_active",
+    "soldiers",
+    "tanks",
+    "aircraft",
+    "ships",
+    "missiles",
+    "nukes",
+    {"cities": "powered"},
+    {"offensive_wars": ("id", "winner", "turns_left")},
+    {"defensive_wars": ("id", "winner", "turns_left")}
+)
+
+
 async def within_war_range(
     score: int, *,
     alliance: int = None,
     powered: bool = True,
     omit_alliance: int = None,
-    token: str = api.TOKEN
+    predicates: typing.Iterable[filters.Predicate] = (),
+    complete: bool = False,
+    stream: bool = False,
+    rank: filters.Ranker = None,
+    top: int = None,
+    prefetch: int = 4,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
 ) -> list:
     """
     Lookup all targets for a given score meeting optional criteria.
@@ -43,298 +301,888 @@ async def within_war_range(
     :param alliance: Target alliance to narrow the search. Defaults to 0.
     :param powered: Whether to discriminate against unpowered cities. Defaults to True.
     :param omit_alliance: An alliance to be omitted from search results.
+    :param predicates: Additional predicates from pwpy.filters that targets must satisfy.
+    :param complete: Whether to search every page of the score range rather than the first 100 nations.
+    :param stream: Whether to filter nations in batches as they are decoded when searching every page.
+    :param rank: A ranker from pwpy.filters, such as filters.weakness, to order targets by, best first.
+    :param top: Number of best ranked targets to keep, or of first targets found when not ranking. Defaults to all of them.
+    :param prefetch: Number of pages fetched ahead at most when searching every page.
+    :param records: Whether to return models.Nation records rather than dictionaries.
     :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
     :return: A list of nations that fall within the provided search criteria.
     """
     min_score, max_score = utils.score_range(score)
+    args = {"min_score": min_score, "max_score": max_score, "vacation_mode": False}
+    checks = [*filters.war_range(powered=powered, omit=omit_alliance), *predicates]
 
-    query = {
-        "nations": {
-            "args": {
-                "first": 100,
-                "min_scored": min_score,
-                "max_score": max_score,
-                "vacation_mode": False
-            },
-            "variables": {
-                "data": {
-                    "id",
-                    "nation_name",
-                    "leader_name",
-                    "color",
-                    "alliance_id",
-                    "alliance_position",
-                    {"alliance": ("name", "score")},
-                    "war_policy",
-                    "flag",
-                    "num_cities",
-                    "score",
-                    "espionage_available",
-                    "last_active",
-                    "soldiers",
-                    "tanks",
-                    "aircraft",
-                    "ships",
-                    "missiles",
-                    "nukes",
-                    {"cities": "powered"},
-                    {"offensive_wars": ("id", "winner", "turns_left")},
-                    {"defensive_wars": ("id", "winner", "turns_left")}
-                }
+    if alliance:
+        args["alliance_id"] = alliance
+
+    if complete and stream:
+        pages = _batched(_stream_pages("nations", WAR_RANGE_FIELDS, args, 500, prefetch, token, client), 100)
+
+    elif complete:
+        pages = _iter_page_data("nations", WAR_RANGE_FIELDS, args, 500, prefetch, token, client)
+
+    else:
+        pages = _first_page("nations", WAR_RANGE_FIELDS, args, 100, token, client)
+
+    if rank is None:
+        targets = [target async for page in pages for target in filters.NationTable(page).filter(*checks)]
+        return models.convert(models.Nation, targets[:top], records)
+
+    ranked = []
+    seen = 0
+
+    async for page in pages:
+        table = filters.NationTable(page)
+        scores = rank(table)
+
+        for index in numpy.flatnonzero(table.mask(*checks)):
+            # earlier nations win ties, and the counter keeps records from being compared
+            entry = (float(scores[index]), -seen - index, table.records[index])
+
+            if top is None or len(ranked) < top:
+                heapq.heappush(ranked, entry)
+
+            else:
+                heapq.heappushpop(ranked, entry)
+
+        seen += len(table)
+
+    targets = [target for *_, target in sorted(ranked, key=lambda entry: entry[:2], reverse=True)]
+    return models.convert(models.Nation, targets, records)
+
+
+ROSTER_FIELDS: tuple = (
+    "id",
+    "nation_name",
+    "leader_name",
+    "alliance_id",
+    "alliance_position",
+    "color",
+    "num_cities",
+    "score",
+    "beige_turns",
+    "soldiers",
+    "tanks",
+    "aircraft",
+    "ships",
+    "missiles",
+    "nukes",
+    {"offensive_wars": ("id", "winner", "turns_left")},
+    {"defensive_wars": ("id", "winner", "turns_left")}
+)
+
+
+async def alliance_war_ranges(
+    alliance: int,
+    enemy: int, *,
+    fields: typing.Iterable = ROSTER_FIELDS,
+    prefetch: int = 4,
+    token: str = None,
+    client: api.Client = None
+) -> typing.Tuple[filters.RangeMatrix, filters.RangeMatrix]:
+    """
+    Compute which members of each of two alliances are within war range of the other's.
+
+    :param alliance: The first alliance.
+    :param enemy: The second alliance.
+    :param fields: The fields to fetch for each member. Must include those in ROSTER_FIELDS used for ranges.
+    :param prefetch: Number of pages fetched ahead at most for each roster.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: The range matrix of the first alliance attacking the second, and of the second attacking the first.
+    """
+    async def roster(identifier: int) -> typing.List[dict]:
+        args = {"alliance_id": [identifier], "vacation_mode": False}
+        return [nation async for nation in _iter_pages("nations", fields, args, 500, prefetch, token, client)]
+
+    if client is None:
+        async with api.Client(token) as client:
+            ours, theirs = await asyncio.gather(roster(alliance), roster(enemy))
+
+    else:
+        ours, theirs = await asyncio.gather(roster(alliance), roster(enemy))
+
+    return filters.range_matrix(ours, theirs), filters.range_matrix(theirs, ours)
+
+
+_NATIONS_PAGES = api.CompiledQuery("NationsPages", {
+    "nations": {
+        "args": {"first": 500},
+        "variables": {
+            "paginatorInfo": {
+                "lastPage"
             }
         }
     }
+})
 
-    if alliance:
-        query["nations"]["args"]["alliance_id"] = alliance
 
-    response = await api.fetch_query(query, token=token)
-    targets = response["nations"]["data"]
+async def nations_pages(*, token: str = None, client: api.Client = None) -> dict:
+    response = await api.fetch_query(_NATIONS_PAGES, token=token, client=client)
+    return response["nations"]["paginatorInfo"]["lastPage"]
+
+
+async def iter_nations(
+    fields: typing.Iterable = NATION_FIELDS, *,
+    args: dict = None,
+    first: int = 500,
+    prefetch: int = 4,
+    stream: bool = False,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> typing.AsyncIterator[dict]:
+    """
+    Iterate over every nation matching the given arguments, page by page.
+
+    :param fields: The fields to fetch for each nation, in the format used by utils.parse_query.
+    :param args: Additional arguments to filter nations by.
+    :param first: Number of nations fetched per page.
+    :param prefetch: Number of pages fetched ahead of the caller at most.
+    :param stream: Whether to yield each nation as it is decoded rather than once its whole page has arrived.
+    :param records: Whether to yield models.Nation records rather than dictionaries.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: An async iterator yielding each nation as its page arrives.
+    """
+    pages = _stream_pages if stream else _iter_pages
+
+    async for nation in pages("nations", fields, args, first, prefetch, token, client):
+        yield models.Nation(nation) if records else nation
 
-    for nation in targets[::]:
-        ongoing = utils.sort_ongoing_wars(nation["defensive_wars"])
-        if nation["alliance_id"] == omit_alliance:
-            targets.remove(nation)
 
-        elif nation["color"] == "beige":
-            targets.remove(nation)
+async def iter_nation_pages(
+    fields: typing.Iterable = NATION_FIELDS, *,
+    args: dict = None,
+    first: int = 500,
+    prefetch: int = 4,
+    token: str = None,
+    client: api.Client = None
+) -> typing.AsyncIterator[typing.List[dict]]:
+    """
+    Iterate over the pages of nations matching the given arguments.
+
+    Closing the iterator early cancels any pages still being fetched ahead.
+
+    :param fields: The fields to fetch for each nation, in the format used by utils.parse_query.
+    :param args: Additional arguments to filter and order nations by.
+    :param first: Number of nations fetched per page.
+    :param prefetch: Number of pages fetched ahead of the caller at most.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: An async iterator yielding each page as a list of nations.
+    """
+    pages = _iter_page_data("nations", fields, args, first, prefetch, token, client)
 
-        elif len(ongoing) == 3:
-            targets.remove(nation)
+    try:
+        async for page in pages:
+            yield page
 
-        elif powered:
-            for city in nation["cities"]:
-                if city["powered"]:
-                    continue
+    finally:
+        await pages.aclose()
 
-                targets.remove(nation)
-                break
 
-    return targets
+NATION_DETAILS_FIELDS: tuple = (
+    "id",
+    "nation_name",
+    "leader_name",
+    "alliance_id",
+    "alliance_position",
+    "alliance_position_info",
+    "alliance",
+    "continent",
+    "war_policy",
+    "domestic_policy",
+    "color",
+    "num_cities",
+    "score",
+    "update_tz",
+    "population",
+    "flag",
+    "vacation_mode_turns",
+    "beige_turns",
+    "espionage_available",
+    "last_active",
+    "date",
+    "soldiers",
+    "tanks",
+    "aircraft",
+    "missiles",
+    "nukes",
+    "discord",
+    "discord_id",
+    "turns_since_last_city",
+    "turns_since_last_project",
+    "projects",
+    "project_bits",
+    "iron_works",
+    "bauxite_works",
+    "arms_stockpile",
+    "emergency_gasoline_reserve",
+    "mass_irrigation",
+    "international_trade_center",
+    "missile_launch_pad",
+    "nuclear_research_facility",
+    "iron_dome",
+    "vital_defense_system",
+    "central_intelligence_agency",
+    "center_for_civil_engineering",
+    "propaganda_bureau",
+    "uranium_enrichment_program",
+    "urban_planning",
+    "advanced_urban_planning",
+    "space_program",
+    "spy_satellite",
+    "moon_landing",
+    "pirate_economy",
+    "recycling_initiative",
+    "telecommunications_satellite",
+    "green_technologies",
+    "arable_land_agency",
+    "clinical_research_center",
+    "specialized_police_training_program",
+    "advanced_engineering_corps",
+    "government_support_agency",
+    "research_and_development_center",
+    "resource_production_center",
+    "metropolitan_planning",
+    "military_salvage",
+    "fallout_shelter",
+    "wars_won",
+    "wars_lost",
+    "tax_id",
+    "alliance_seniority",
+    "gross_national_income",
+    "gross_domestic_product",
+    "soldier_casualties",
+    "soldier_kills",
+    "tank_casualties",
+    "tank_kills",
+    "aircraft_casualties",
+    "aircraft_kills",
+    "ship_casualties",
+    "ship_kills",
+    "missile_casualties",
+    "missile_kills",
+    "nuke_casualties",
+    "nuke_kills",
+    "money_looted",
+    "vip"
+)
 
+NATION_PROFILES: typing.Dict[str, tuple] = {
+    "identity": (
+        "id",
+        "nation_name",
+        "leader_name",
+        "alliance_id",
+        "alliance_position",
+        "continent",
+        "color",
+        "flag",
+        "date",
+        "last_active",
+        "discord",
+        "discord_id",
+        "vip"
+    ),
+    "military": (
+        "id",
+        "num_cities",
+        "score",
+        "soldiers",
+        "tanks",
+        "aircraft",
+        "ships",
+        "missiles",
+        "nukes",
+        "espionage_available",
+        "beige_turns",
+        "vacation_mode_turns",
+        "war_policy",
+        "wars_won",
+        "wars_lost",
+        "soldier_casualties",
+        "soldier_kills",
+        "tank_casualties",
+        "tank_kills",
+        "aircraft_casualties",
+        "aircraft_kills",
+        "ship_casualties",
+        "ship_kills",
+        "missile_casualties",
+        "missile_kills",
+        "nuke_casualties",
+        "nuke_kills",
+        "money_looted"
+    ),
+    "projects": (
+        "id",
+        "projects",
+        "project_bits",
+        "iron_works",
+        "bauxite_works",
+        "arms_stockpile",
+        "emergency_gasoline_reserve",
+        "mass_irrigation",
+        "international_trade_center",
+        "missile_launch_pad",
+        "nuclear_research_facility",
+        "iron_dome",
+        "vital_defense_system",
+        "central_intelligence_agency",
+        "center_for_civil_engineering",
+        "propaganda_bureau",
+        "uranium_enrichment_program",
+        "urban_planning",
+        "advanced_urban_planning",
+        "space_program",
+        "spy_satellite",
+        "moon_landing",
+        "pirate_economy",
+        "recycling_initiative",
+        "telecommunications_satellite",
+        "green_technologies",
+        "arable_land_agency",
+        "clinical_research_center",
+        "specialized_police_training_program",
+        "advanced_engineering_corps",
+        "government_support_agency",
+        "research_and_development_center",
+        "resource_production_center",
+        "metropolitan_planning",
+        "military_salvage",
+        "fallout_shelter",
+        "turns_since_last_project"
+    ),
+    "economy": (
+        "id",
+        "num_cities",
+        "population",
+        "domestic_policy",
+        "tax_id",
+        "gross_national_income",
+        "gross_domestic_product",
+        "update_tz",
+        "turns_since_last_city"
+    )
+}
 
-async def nations_pages(*, token: str = api.TOKEN) -> dict:
-    query = {
-        "nations": {
-            "args": {"first": 500},
-            "variables": {
-                "paginatorInfo": {
-                    "lastPage"
-                }
+_COMPILED: typing.Dict[typing.Tuple[str, str], api.CompiledQuery] = {}
+
+
+def _select(
+    field: str,
+    fields: typing.Optional[typing.Iterable],
+    profile: typing.Optional[str],
+    profiles: typing.Dict[str, tuple],
+    default: tuple,
+    many: bool = False
+) -> api.CompiledQuery:
+    """
+    Compile, or reuse, a by-id query selecting a profile and any additional fields.
+
+    Queries for many ids also take the page size as a variable and always select the id.
+    """
+    if profile is not None and profile not in profiles:
+        raise exceptions.InvalidQuery(f"unknown profile {profile!r}, expected one of {', '.join(profiles)}")
+
+    selected = profiles[profile] if profile is not None else ()
+
+    if fields is not None:
+        selected += tuple(item for item in fields if item not in selected)
+
+    selected = selected or default
+
+    if many and "id" not in selected:
+        selected = ("id", *selected)
+
+    key = (field, repr(selected), many)
+    query = _COMPILED.get(key)
+
+    if query is None and many:
+        query = _COMPILED[key] = api.CompiledQuery("ManyDetails", {
+            field: {"args": {"id": "$id", "first": "$first"}, "variables": {"data": selected}}
+        }, {"id": "[Int]", "first": "Int"})
+
+    elif query is None:
+        query = _COMPILED[key] = api.CompiledQuery("Details", {
+            field: {"args": {"id": "$id", "first": 1}, "variables": {"data": selected}}
+        }, {"id": "[Int]"})
+
+    return query
+
+
+async def _fetch_by_ids(
+    field: str,
+    query: api.CompiledQuery,
+    ids: typing.Iterable[int],
+    token: str,
+    client: typing.Optional[api.Client]
+) -> typing.Dict[int, dict]:
+    """
+    Fetch the records of many ids in as few queries as the page size allows, keyed by id.
+    """
+    if client is None:
+        async with api.Client(token) as client:
+            return await _fetch_by_ids(field, query, ids, token, client)
+
+    ids = list(dict.fromkeys(int(identifier) for identifier in ids))
+    chunks = [ids[index:index + 500] for index in range(0, len(ids), 500)]
+
+    responses = await asyncio.gather(*(
+        api.fetch_query(query, variables={"id": chunk, "first": len(chunk)}, token=token, client=client)
+        for chunk in chunks
+    ))
+
+    return {int(record["id"]): record for response in responses for record in response[field]["data"]}
+
+
+async def poll(
+    function: typing.Callable[..., typing.Awaitable[typing.Any]],
+    *args: typing.Any,
+    interval: float = 60.0,
+    **kwargs: typing.Any
+) -> typing.AsyncIterator[typing.Any]:
+    """
+    Repeatedly call a query function, yielding each result, at most once every interval.
+
+    Queries are compiled once, so every refresh sends the same document with the same variables.
+    When no client is passed, one is opened for as long as polling goes on and passed to every
+    call, so refreshes reuse its pooled connections.
+
+    :param function: The query function to call, such as alliances_bank_contents.
+    :param interval: Seconds between the start of each call.
+    :return: An async iterator yielding each result as it arrives.
+    """
+    if kwargs.get("client") is None:
+        async with api.Client(kwargs.get("token")) as client:
+            async for result in poll(function, *args, interval=interval, **{**kwargs, "client": client}):
+                yield result
+
+        return
+
+    loop = asyncio.get_running_loop()
+
+    while True:
+        started = loop.time()
+        yield await function(*args, **kwargs)
+        await asyncio.sleep(max(0.0, started + interval - loop.time()))
+
+
+async def nation_details(
+    nation: int, *,
+    fields: typing.Iterable = None,
+    profile: str = None,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    """
+    Lookup the details of a nation, optionally only a subset of them.
+
+    :param nation: The id of the nation to be looked up.
+    :param fields: Fields to fetch, in addition to those of the profile when one is given.
+    :param profile: A named set of fields from NATION_PROFILES, such as "military".
+    :param records: Whether to return models.Nation records rather than dictionaries.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the query with.
+    :return: A list holding the nation, if found.
+    """
+    query = _select("nations", fields, profile, NATION_PROFILES, NATION_DETAILS_FIELDS)
+    response = await api.fetch_query(query, variables={"id": [nation]}, token=token, client=client)
+    return models.convert(models.Nation, response["nations"]["data"], records)
+
+
+async def nation_military(
+    nation: int, *,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    return await nation_details(nation, profile="military", records=records, token=token, client=client)
+
+
+async def nation_discord(
+    nation: int, *,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    fields = ("id", "discord", "discord_id")
+    return await nation_details(nation, fields=fields, records=records, token=token, client=client)
+
+
+_NATION_BANK_CONTENTS = api.CompiledQuery("NationBankContents", {
+    "nations": {
+        "args": {"id": "$id", "first": 1},
+        "variables": {
+            "data": {
+                "money",
+                "coal",
+                "uranium",
+                "iron",
+                "bauxite",
+                "steel",
+                "gasoline",
+                "munitions",
+                "oil",
+                "food",
+                "aluminum"
             }
         }
     }
+}, {"id": "[Int]"})
 
-    response = await api.fetch_query(query, token=token)
-    return response["nations"]["paginatorInfo"]["lastPage"]
 
+async def nation_bank_contents(
+    nation: int, *,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    response = await api.fetch_query(_NATION_BANK_CONTENTS, variables={"id": [nation]}, token=token, client=client)
+    return models.convert(models.BankContents, response["nations"]["data"], records)
 
-async def nation_details(nation: int, *, token: str = api.TOKEN) -> dict:
-    query = {
-        "nations": {
-            "args": {"id": nation, "first": 1},
-            "variables": {
-                "data": {
-                    "id",
-                    "nation_name",
-                    "leader_name",
-                    "alliance_id",
-                    "alliance_position",
-                    "alliance_position_info",
-                    "alliance",
-                    "continent",
-                    "war_policy",
-                    "domestic_policy",
-                    "color",
-                    "num_cities",
-                    "score",
-                    "update_tz",
-                    "population",
-                    "flag",
-                    "vacation_mode_turns",
-                    "beige_turns",
-                    "espionage_available",
-                    "last_active",
-                    "date",
-                    "soldiers",
-                    "tanks",
-                    "aircraft",
-                    "missiles",
-                    "nukes",
-                    "discord",
-                    "discord_id",
-                    "turns_since_last_city",
-                    "turns_since_last_project",
-                    "projects",
-                    "project_bits",
-                    "iron_works",
-                    "bauxite_works",
-                    "arms_stockpile",
-                    "emergency_gasoline_reserve",
-                    "mass_irrigation",
-                    "international_trade_center",
-                    "missile_launch_pad",
-                    "nuclear_research_facility",
-                    "iron_dome",
-                    "vital_defense_system",
-                    "central_intelligence_agency",
-                    "center_for_civil_engineering",
-                    "propaganda_bureau",
-                    "uranium_enrichment_program",
-                    "urban_planning",
-                    "advanced_urban_planning",
-                    "space_program",
-                    "spy_satellite",
-                    "moon_landing",
-                    "pirate_economy",
-                    "recycling_initiative",
-                    "telecommunications_satellite",
-                    "green_technologies",
-                    "arable_land_agency",
-                    "clinical_research_center",
-                    "specialized_police_training_program",
-                    "advanced_engineering_corps",
-                    "government_support_agency",
-                    "research_and_development_center",
-                    "resource_production_center",
-                    "metropolitan_planning",
-                    "military_salvage",
-                    "fallout_shelter",
-                    "wars_won",
-                    "wars_lost",
-                    "tax_id",
-                    "alliance_seniority",
-                    "gross_national_income",
-                    "gross_domestic_product",
-                    "soldier_casualties",
-                    "soldier_kills",
-                    "tank_casualties",
-                    "tank_kills",
-                    "aircraft_casualties",
-                    "aircraft_kills",
-                    "ship_casualties",
-                    "ship_kills",
-                    "missile_casualties",
-                    "missile_kills",
-                    "nuke_casualties",
-                    "nuke_kills",
-                    "money_looted",
-                    "vip"
-                }
+
+_ALLIANCES_PAGES = api.CompiledQuery("AlliancesPages", {
+    "alliances": {
+        "args": {"first": 500},
+        "variables": {
+            "paginatorInfo": {
+                "lastPage"
             }
         }
     }
+})
 
-    response = await api.fetch_query(query, token=token)
-    return response["nations"]["data"]
 
+async def alliances_pages(*, token: str = None, client: api.Client = None) -> dict:
+    response = await api.fetch_query(_ALLIANCES_PAGES, token=token, client=client)
+    return response["alliances"]["paginatorInfo"]["lastPage"]
 
-async def nation_military(nation: int, *, token: str = api.TOKEN) -> dict:
-    raise NotImplementedError
 
+async def iter_alliances(
+    fields: typing.Iterable = ALLIANCE_FIELDS, *,
+    args: dict = None,
+    first: int = 500,
+    prefetch: int = 4,
+    stream: bool = False,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> typing.AsyncIterator[dict]:
+    """
+    Iterate over every alliance matching the given arguments, page by page.
 
-async def nation_discord(nation: int, *, token: str = api.TOKEN) -> dict:
-    raise NotImplementedError
+    :param fields: The fields to fetch for each alliance, in the format used by utils.parse_query.
+    :param args: Additional arguments to filter alliances by.
+    :param first: Number of alliances fetched per page.
+    :param prefetch: Number of pages fetched ahead of the caller at most.
+    :param stream: Whether to yield each alliance as it is decoded rather than once its whole page has arrived.
+    :param records: Whether to yield models.Alliance records rather than dictionaries.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: An async iterator yielding each alliance as its page arrives.
+    """
+    pages = _stream_pages if stream else _iter_pages
 
+    async for alliance in pages("alliances", fields, args, first, prefetch, token, client):
+        yield models.Alliance(alliance) if records else alliance
 
-async def nation_bank_contents(nation: int, *, token: str = api.TOKEN) -> dict:
-    query = {
-        "nations": {
-            "args": {"id": nation, "first": 1},
-            "variables": {
-                "data": {
-                    "money",
-                    "coal",
-                    "uranium",
-                    "iron",
-                    "bauxite",
-                    "steel",
-                    "gasoline",
-                    "munitions",
-                    "oil",
-                    "food",
-                    "aluminum"
-                }
-            }
-        }
+
+ALLIANCE_DETAILS_FIELDS: tuple = (
+    "id",
+    "name",
+    "acronym",
+    "score",
+    "color",
+    "date",
+    "average_score",
+    "accept_members",
+    "discord_link",
+    "forum_link",
+    "wiki_link",
+    "flag"
+)
+
+ALLIANCE_PROFILES: typing.Dict[str, tuple] = {
+    "identity": (
+        "id",
+        "name",
+        "acronym",
+        "color",
+        "flag",
+        "date"
+    ),
+    "stats": (
+        "id",
+        "score",
+        "average_score",
+        "accept_members"
+    ),
+    "links": (
+        "id",
+        "discord_link",
+        "forum_link",
+        "wiki_link"
+    )
+}
+
+
+async def alliance_details(
+    alliance: int, *,
+    fields: typing.Iterable = None,
+    profile: str = None,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    """
+    Lookup the details of an alliance, optionally only a subset of them.
+
+    :param alliance: The id of the alliance to be looked up.
+    :param fields: Fields to fetch, in addition to those of the profile when one is given.
+    :param profile: A named set of fields from ALLIANCE_PROFILES, such as "links".
+    :param records: Whether to return models.Alliance records rather than dictionaries.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the query with.
+    :return: A list holding the alliance, if found.
+    """
+    query = _select("alliances", fields, profile, ALLIANCE_PROFILES, ALLIANCE_DETAILS_FIELDS)
+    response = await api.fetch_query(query, variables={"id": [alliance]}, token=token, client=client)
+    return models.convert(models.Alliance, response["alliances"]["data"], records)
+
+
+async def alliances_details(
+    alliances: typing.Iterable[int], *,
+    fields: typing.Iterable = None,
+    profile: str = None,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> typing.Dict[int, dict]:
+    """
+    Lookup the details of many alliances at once, optionally only a subset of them.
+
+    :param alliances: The ids of the alliances to be looked up.
+    :param fields: Fields to fetch, in addition to those of the profile when one is given.
+    :param profile: A named set of fields from ALLIANCE_PROFILES, such as "links".
+    :param records: Whether to return models.Alliance records rather than dictionaries.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: The alliances found, keyed by id.
+    """
+    query = _select("alliances", fields, profile, ALLIANCE_PROFILES, ALLIANCE_DETAILS_FIELDS, many=True)
+    found = await _fetch_by_ids("alliances", query, alliances, token, client)
+    return {identifier: models.Alliance(alliance) for identifier, alliance in found.items()} if records else found
+
+
+MILITARY_FIELDS: tuple = (
+    "id",
+    "alliance_position",
+    "num_cities",
+    "soldiers",
+    "tanks",
+    "aircraft",
+    "ships",
+    "missiles",
+    "nukes"
+)
+
+UNITS: tuple = ("soldiers", "tanks", "aircraft", "ships", "missiles", "nukes")
+
+UNIT_CAPS: typing.Dict[str, int] = {
+    "soldiers": 15000,
+    "tanks": 1250,
+    "aircraft": 75,
+    "ships": 15
+}
+
+
+async def alliance_military(
+    alliance: int, *,
+    prefetch: int = 4,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    """
+    Total the military of an alliance's members.
+
+    Militarization is the share of the units every member's cities could hold with fully built
+    military improvements, as given by UNIT_CAPS. Applicants are not counted.
+
+    :param alliance: The alliance to be totalled.
+    :param prefetch: Number of pages of members fetched ahead at most.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: The members, cities, unit totals, units per city and militarization ratios of the alliance.
+    """
+    args = {"alliance_id": [alliance]}
+    members = _iter_pages("nations", MILITARY_FIELDS, args, 500, prefetch, token, client)
+    nations = [nation async for nation in members if nation["alliance_position"] != "APPLICANT"]
+
+    columns = ("num_cities", *UNITS)
+    table = numpy.array([[nation[column] for column in columns] for nation in nations], dtype=numpy.int64)
+    totals = table.reshape(-1, len(columns)).sum(axis=0)
+    cities = int(totals[0])
+    units = dict(zip(UNITS, totals[1:].tolist()))
+    caps = numpy.array(list(UNIT_CAPS.values())) * max(cities, 1)
+
+    return {
+        "members": len(nations),
+        "cities": cities,
+        "totals": units,
+        "per_city": {unit: total / max(cities, 1) for unit, total in units.items()},
+        "militarization": dict(zip(UNIT_CAPS, (totals[1:len(UNIT_CAPS) + 1] / caps).tolist()))
     }
 
-    response = await api.fetch_query(query, token=token)
-    return response["nations"]["data"]
 
+async def alliance_discord(
+    alliance: int, *,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    fields = ("id", "discord_link")
+    return await alliance_details(alliance, fields=fields, records=records, token=token, client=client)
 
-async def alliances_pages(*, token: str = api.TOKEN) -> dict:
-    query = {
-        "nations": {
-            "args": {"first": 500},
-            "variables": {
-                "paginatorInfo": {
-                    "lastPage"
-                }
+
+_ALLIANCE_BANK_CONTENTS = api.CompiledQuery("AllianceBankContents", {
+    "alliances": {
+        "args": {"id": "$id", "first": 1},
+        "variables": {
+            "data": {
+                "money",
+                "coal",
+                "uranium",
+                "iron",
+                "bauxite",
+                "steel",
+                "gasoline",
+                "munitions",
+                "oil",
+                "food",
+                "aluminum"
             }
         }
     }
+}, {"id": "[Int]"})
 
-    response = await api.fetch_query(query, token=token)
-    return response["alliances"]["paginatorInfo"]["lastPage"]
 
+async def alliance_bank_contents(
+    alliance: int, *,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    response = await api.fetch_query(_ALLIANCE_BANK_CONTENTS, variables={"id": [alliance]}, token=token, client=client)
+    return models.convert(models.BankContents, response["alliances"]["data"], records)
 
-async def alliance_details(alliance: int, *, token: str = api.TOKEN) -> dict:
-    query = {
-        "alliances": {
-            "args": {"id": alliance, "first": 1},
-            "variables": {
-                "data": {
-                    "id",
-                    "name",
-                    "acronym",
-                    "score",
-                    "color",
-                    "date",
-                    "average_score",
-                    "accept_members",
-                    "discord_link",
-                    "forum_link",
-                    "wiki_link",
-                    "flag"
-                }
-            }
+
+_ALLIANCES_BANK_CONTENTS = api.CompiledQuery("AlliancesBankContents", {
+    "alliances": {
+        "args": {"id": "$id", "first": "$first"},
+        "variables": {
+            "data": (
+                "id",
+                "money",
+                "coal",
+                "uranium",
+                "iron",
+                "bauxite",
+                "steel",
+                "gasoline",
+                "munitions",
+                "oil",
+                "food",
+                "aluminum"
+            )
         }
     }
+}, {"id": "[Int]", "first": "Int"})
+
+
+async def alliances_bank_contents(
+    alliances: typing.Iterable[int], *,
+    records: bool = False,
+    token: str = None,
+    client: api.Client = None
+) -> typing.Dict[int, dict]:
+    """
+    Lookup the bank contents of many alliances at once.
+
+    :param alliances: The ids of the alliances to be looked up.
+    :param records: Whether to return models.BankContents records rather than dictionaries.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: The bank contents of the alliances found, keyed by id.
+    """
+    found = await _fetch_by_ids("alliances", _ALLIANCES_BANK_CONTENTS, alliances, token, client)
+    return {identifier: models.BankContents(bank) for identifier, bank in found.items()} if records else found
+
+
+REBUILD_FIELDS: tuple = (
+    "id",
+    "nation_name",
+    "alliance_position",
+    "num_cities",
+    {"cities": ("id", "infrastructure", "land")}
+)
 
-    response = await api.fetch_query(query, token=token)
-    return response["alliances"]["data"]
 
+async def alliance_rebuild_cost(
+    alliance: int,
+    infrastructure: float,
+    land: float, *,
+    prefetch: int = 4,
+    token: str = None,
+    client: api.Client = None
+) -> dict:
+    """
+    Estimate the cost to bring every city of an alliance's members up to a given infrastructure and land.
 
-async def alliance_military(alliance: int, *, token: str = api.TOKEN) -> dict:
-    raise NotImplementedError
+    Cities already at or above the desired amounts cost nothing, and applicants are not counted.
 
+    :param alliance: The alliance to be estimated.
+    :param infrastructure: The desired infrastructure of every city.
+    :param land: The desired land of every city.
+    :param prefetch: Number of pages of members fetched ahead at most.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    :return: The infrastructure, land, total and next city costs of each member, keyed by nation id, and of the alliance.
+    """
+    args = {"alliance_id": [alliance]}
+    members = _iter_pages("nations", REBUILD_FIELDS, args, 500, prefetch, token, client)
+    nations = [nation async for nation in members if nation["alliance_position"] != "APPLICANT"]
 
-async def alliance_discord(alliance: int, *, token: str = api.TOKEN) -> dict:
-    raise NotImplementedError
+    owners, cities = filters.flatten(nations, "cities")
+    current = numpy.array([[city["infrastructure"], city["land"]] for city in cities], dtype=numpy.float64).reshape(-1, 2)
+    infra = costs.infra_cost(numpy.minimum(current[:, 0], infrastructure), infrastructure)
+    acres = costs.land_cost(numpy.minimum(current[:, 1], land), land)
 
+    infra = numpy.bincount(owners, weights=infra, minlength=len(nations))
+    acres = numpy.bincount(owners, weights=acres, minlength=len(nations))
+    next_city = costs.city_cost([int(nation["num_cities"]) + 1 for nation in nations])
 
-async def alliance_bank_contents(alliance: int, *, token: str = api.TOKEN) -> dict:
-    query = {
-        "alliances": {
-            "args": {"id": alliance, "first": 1},
-            "variables": {
-                "data": {
-                    "money",
-                    "coal",
-                    "uranium",
-                    "iron",
-                    "bauxite",
-                    "steel",
-                    "gasoline",
-                    "munitions",
-                    "oil",
-                    "food",
-                    "aluminum"
-                }
+    return {
+        "nations": {
+            int(nation["id"]): {
+                "nation_name": nation["nation_name"],
+                "cities": int(nation["num_cities"]),
+                "infrastructure": float(infra[index]),
+                "land": float(acres[index]),
+                "total": float(infra[index] + acres[index]),
+                "next_city": float(next_city[index])
             }
-        }
+            for index, nation in enumerate(nations)
+        },
+        "infrastructure": float(infra.sum()),
+        "land": float(acres.sum()),
+        "total": float(infra.sum() + acres.sum()),
+        "next_city": float(next_city.sum())
     }
-
-    response = await api.fetch_query(query, token=token)
-    return response["alliances"]["data"]
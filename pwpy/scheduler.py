@@ -0,0 +1,225 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import asyncio
+import contextlib
+import email.utils
+import time
+import typing
+
+
+__all__: typing.List[str] = [
+    "Scheduler",
+    "parse_retry_after"
+]
+
+
+def parse_retry_after(value: typing.Optional[str], default: float = 60.0) -> float:
+    """
+    Parse the value of a Retry-After header into seconds.
+
+    :param value: Header value, either a number of seconds or an HTTP date.
+    :param default: Seconds to fall back on when the header is missing or malformed.
+    :return: Seconds to wait before retrying.
+    """
+    if not value:
+        return default
+
+    try:
+        return max(float(value), 0.0)
+
+    except ValueError:
+        pass
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+
+    except (TypeError, ValueError):
+        return default
+
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+class _Bucket:
+
+    __slots__: typing.List = [
+        "rate",
+        "capacity",
+        "tokens",
+        "updated"
+    ]
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """
+        Take a single token, returning the seconds to wait if none are available.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+
+class Scheduler:
+    """
+    Paces requests to the gql api.
+
+    Each api key gets a token bucket refilled at a requests-per-minute budget, the number
+    of requests in flight is capped, and a rate limit response pauses every queued request
+    until the server's Retry-After has elapsed.
+    """
+
+    __slots__: typing.List = [
+        "per_minute",
+        "burst",
+        "concurrency",
+        "max_retries",
+        "_buckets",
+        "_semaphore",
+        "_resume_at",
+        "queue_depth",
+        "in_flight",
+        "requests",
+        "throttled",
+        "total_wait",
+        "max_wait"
+    ]
+
+    def __init__(
+        self, *,
+        per_minute: int = 60,
+        burst: int = None,
+        concurrency: int = 10,
+        max_retries: int = 5
+    ) -> None:
+        """
+        :param per_minute: Requests allowed per minute for each api key.
+        :param burst: Requests an idle api key may send at once. Defaults to concurrency.
+        :param concurrency: Maximum number of requests in flight at once.
+        :param max_retries: Times a rate limited request is retried before giving up.
+        """
+        self.per_minute = per_minute
+        self.burst = burst or concurrency
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._buckets: typing.Dict[str, _Bucket] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._resume_at = 0.0
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+    @property
+    def paused_for(self) -> float:
+        """
+        Seconds remaining before paused requests resume.
+        """
+        return max(self._resume_at - time.monotonic(), 0.0)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold every queued request for the given number of seconds.
+        """
+        self.throttled += 1
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def stats(self) -> typing.Dict[str, float]:
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "average_wait": self.average_wait,
+            "max_wait": self.max_wait,
+            "paused_for": self.paused_for
+        }
+
+    async def _wait_turn(self, token: str) -> None:
+        bucket = self._buckets.get(token)
+
+        if bucket is None:
+            bucket = self._buckets[token] = _Bucket(self.per_minute / 60, self.burst, time.monotonic())
+
+        while True:
+            now = time.monotonic()
+
+            if now < self._resume_at:
+                await asyncio.sleep(self._resume_at - now)
+                continue
+
+            delay = bucket.take(now)
+
+            if not delay:
+                return
+
+            await asyncio.sleep(delay)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, token: str) -> typing.AsyncIterator[None]:
+        """
+        Wait for a request on the given api key to be allowed out, holding a slot until exit.
+        """
+        start = time.monotonic()
+        self.queue_depth += 1
+
+        try:
+            await self._semaphore.acquire()
+
+            try:
+                await self._wait_turn(token)
+
+            except BaseException:
+                self._semaphore.release()
+                raise
+
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - start
+        self.requests += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.in_flight += 1
+
+        try:
+            yield
+
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
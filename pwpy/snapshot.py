@@ -0,0 +1,381 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import api, queries
+
+import datetime
+import tempfile
+import asyncio
+import shutil
+import numpy
+import typing
+import json
+import time
+import os
+
+
+__all__: typing.List[str] = [
+    "NATION_COLUMNS",
+    "ALLIANCE_COLUMNS",
+    "StringTable",
+    "Table",
+    "Snapshot",
+    "write_table",
+    "export",
+    "load"
+]
+
+
+# column name to dtype, where "str" columns are stored as indices into a shared string table
+NATION_COLUMNS: typing.Dict[str, str] = {
+    "id": "int64",
+    "alliance_id": "int64",
+    "nation_name": "str",
+    "leader_name": "str",
+    "color": "str",
+    "score": "float64",
+    "num_cities": "int32",
+    "soldiers": "int64",
+    "tanks": "int64",
+    "aircraft": "int64",
+    "ships": "int64",
+    "missiles": "int64",
+    "nukes": "int64",
+    "beige_turns": "int32",
+    "vacation_mode_turns": "int32",
+    "last_active": "datetime"
+}
+
+ALLIANCE_COLUMNS: typing.Dict[str, str] = {
+    "id": "int64",
+    "name": "str",
+    "acronym": "str",
+    "color": "str",
+    "score": "float64",
+    "average_score": "float64"
+}
+
+
+def _convert(kind: str, value: typing.Any) -> typing.Any:
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(value).timestamp() if value else 0.0
+
+    return value or 0
+
+
+class StringTable:
+    """
+    Strings packed into one UTF-8 buffer with an offset per string, decoded on access.
+    """
+
+    __slots__: typing.List = [
+        "data",
+        "offsets"
+    ]
+
+    def __init__(self, data: numpy.ndarray, offsets: numpy.ndarray) -> None:
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode()
+
+    @classmethod
+    def build(cls, strings: typing.List[str]) -> "StringTable":
+        encoded = [string.encode() for string in strings]
+        offsets = numpy.zeros(len(encoded) + 1, dtype=numpy.int64)
+        numpy.cumsum([len(string) for string in encoded], out=offsets[1:])
+        data = numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8)
+        return cls(data, offsets)
+
+
+class Table:
+    """
+    Typed columns of a snapshot. Numeric columns are arrays, string columns are indices
+    into the snapshot's string table and are decoded with :meth:`string`.
+    """
+
+    __slots__: typing.List = [
+        "schema",
+        "columns",
+        "strings"
+    ]
+
+    def __init__(self, schema: typing.Dict[str, str], columns: typing.Dict[str, numpy.ndarray], strings: StringTable):
+        self.schema = schema
+        self.columns = columns
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, name: str) -> numpy.ndarray:
+        return self.columns[name]
+
+    def string(self, name: str, row: int) -> str:
+        return self.strings[int(self.columns[name][row])]
+
+    def row(self, row: int) -> dict:
+        """
+        Rebuild a single record as a dict.
+        """
+        record = {}
+
+        for name, kind in self.schema.items():
+            if kind == "str":
+                record[name] = self.string(name, row)
+
+            else:
+                record[name] = self.columns[name][row].item()
+
+        return record
+
+
+class Snapshot:
+    """
+    A loaded snapshot of every nation and alliance.
+    """
+
+    __slots__: typing.List = [
+        "path",
+        "created",
+        "nations",
+        "alliances"
+    ]
+
+    def __init__(self, path: str, created: float, nations: Table, alliances: Table) -> None:
+        self.path = path
+        self.created = created
+        self.nations = nations
+        self.alliances = alliances
+
+
+class _Builder:
+
+    __slots__: typing.List = [
+        "schema",
+        "values",
+        "strings",
+        "interned"
+    ]
+
+    def __init__(self, schema: typing.Dict[str, str], strings: typing.List[str], interned: typing.Dict[str, int]):
+        self.schema = schema
+        self.values: typing.Dict[str, list] = {name: [] for name in schema}
+        self.strings = strings
+        self.interned = interned
+
+    def append(self, record: dict) -> None:
+        for name, kind in self.schema.items():
+            value = record.get(name)
+
+            if kind == "str":
+                value = value or ""
+                index = self.interned.get(value)
+
+                if index is None:
+                    index = self.interned[value] = len(self.strings)
+                    self.strings.append(value)
+
+                self.values[name].append(index)
+
+            else:
+                self.values[name].append(_convert(kind, value))
+
+    def write(self, path: str, prefix: str) -> None:
+        for name, kind in self.schema.items():
+            dtype = {"str": "int32", "datetime": "float64"}.get(kind, kind)
+            numpy.save(os.path.join(path, f"{prefix}.{name}.npy"), numpy.asarray(self.values[name], dtype=dtype))
+
+
+# names the version directory of the current snapshot
+_CURRENT = "CURRENT"
+
+
+def _versions(path: str) -> typing.List[str]:
+    versions = [name for name in os.listdir(path) if name.startswith("v") and os.path.isdir(os.path.join(path, name))]
+    return sorted(versions, key=lambda name: tuple(int(part) for part in name[1:].split("-")))
+
+
+def _write(path: str, nations: _Builder, alliances: _Builder, keep: int) -> None:
+    os.makedirs(path, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=path)
+
+    try:
+        nations.write(staging, "nations")
+        alliances.write(staging, "alliances")
+
+        table = StringTable.build(nations.strings)
+        numpy.save(os.path.join(staging, "strings.data.npy"), table.data)
+        numpy.save(os.path.join(staging, "strings.offsets.npy"), table.offsets)
+
+        manifest = {
+            "created": datetime.datetime.now(datetime.timezone.utc).timestamp(),
+            "nations": nations.schema,
+            "alliances": alliances.schema
+        }
+
+        with open(os.path.join(staging, "manifest.json"), "w") as file:
+            json.dump(manifest, file)
+
+        version = f"v{time.time_ns()}-{os.getpid()}"
+        os.rename(staging, os.path.join(path, version))
+
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # files of a published version are never written again, so mapped snapshots stay valid,
+    # and the pointer is swapped atomically so readers see either the old or the new version
+    pointer = os.path.join(path, f"{_CURRENT}.{version}.tmp")
+
+    with open(pointer, "w") as file:
+        file.write(version)
+
+    os.replace(pointer, os.path.join(path, _CURRENT))
+
+    for stale in _versions(path)[:-max(keep, 1)]:
+        if stale != version:
+            shutil.rmtree(os.path.join(path, stale), ignore_errors=True)
+
+
+def write_table(
+    path: str,
+    nations: typing.Iterable[dict],
+    alliances: typing.Iterable[dict], *,
+    nation_columns: typing.Dict[str, str] = None,
+    alliance_columns: typing.Dict[str, str] = None,
+    keep: int = 2
+) -> None:
+    """
+    Write nations and alliances to a snapshot directory.
+
+    Every write publishes a new version beside the previous ones, which are left untouched
+    for processes still reading them until more than keep versions exist.
+
+    :param path: The directory to write to, created if it does not exist.
+    :param nations: Nations to be written.
+    :param alliances: Alliances to be written.
+    :param nation_columns: Columns to write for nations. Defaults to NATION_COLUMNS.
+    :param alliance_columns: Columns to write for alliances. Defaults to ALLIANCE_COLUMNS.
+    :param keep: Number of most recent versions kept.
+    """
+    strings, interned = [], {}
+    nation_builder = _Builder(nation_columns or NATION_COLUMNS, strings, interned)
+    alliance_builder = _Builder(alliance_columns or ALLIANCE_COLUMNS, strings, interned)
+
+    for nation in nations:
+        nation_builder.append(nation)
+
+    for alliance in alliances:
+        alliance_builder.append(alliance)
+
+    _write(path, nation_builder, alliance_builder, keep)
+
+
+async def export(
+    path: str, *,
+    prefetch: int = 4,
+    keep: int = 2,
+    token: str = None,
+    client: api.Client = None
+) -> None:
+    """
+    Download every nation and alliance into a snapshot directory.
+
+    Records are packed into columns as their pages arrive, so no page is held longer
+    than it takes to append it.
+
+    :param path: The directory to write to, created if it does not exist.
+    :param prefetch: Number of pages fetched ahead at most.
+    :param keep: Number of most recent versions kept, as with write_table.
+    :param token: A valid Politics and War API key.
+    :param client: A client to send the queries with.
+    """
+    if client is None:
+        async with api.Client(token) as client:
+            return await export(path, prefetch=prefetch, keep=keep, token=token, client=client)
+
+    strings, interned = [], {}
+    nation_builder = _Builder(NATION_COLUMNS, strings, interned)
+    alliance_builder = _Builder(ALLIANCE_COLUMNS, strings, interned)
+
+    async def drain(records: typing.AsyncIterator[dict], builder: _Builder) -> None:
+        async for record in records:
+            builder.append(record)
+
+    await asyncio.gather(
+        drain(queries.iter_nations(tuple(NATION_COLUMNS), prefetch=prefetch, token=token, client=client), nation_builder),
+        drain(queries.iter_alliances(tuple(ALLIANCE_COLUMNS), prefetch=prefetch, token=token, client=client), alliance_builder)
+    )
+
+    _write(path, nation_builder, alliance_builder, keep)
+
+
+def _load(path: str, directory: str) -> Snapshot:
+    with open(os.path.join(directory, "manifest.json")) as file:
+        manifest = json.load(file)
+
+    def column(name: str) -> numpy.ndarray:
+        return numpy.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+    strings = StringTable(column("strings.data"), column("strings.offsets"))
+    tables = {
+        kind: Table(manifest[kind], {name: column(f"{kind}.{name}") for name in manifest[kind]}, strings)
+        for kind in ("nations", "alliances")
+    }
+
+    return Snapshot(path, manifest["created"], tables["nations"], tables["alliances"])
+
+
+def load(path: str) -> Snapshot:
+    """
+    Load a snapshot directory.
+
+    Columns are memory-mapped read-only rather than read, so loading is near instant and
+    every process loading the same snapshot shares a single copy of it. The current version
+    is loaded, and stays valid while newer versions are written.
+
+    :param path: The directory a snapshot was written to.
+    :return: The loaded snapshot.
+    """
+    attempts = 3
+
+    for attempt in range(attempts):
+        try:
+            with open(os.path.join(path, _CURRENT)) as file:
+                directory = os.path.join(path, file.read().strip())
+
+        except FileNotFoundError:
+            directory = path
+
+        try:
+            return _load(path, directory)
+
+        # the version was pruned between reading the pointer and opening it
+        except FileNotFoundError:
+            if attempt == attempts - 1:
+                raise
@@ -0,0 +1,182 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import codecs
+import json
+import typing
+
+
+__all__: typing.List[str] = [
+    "iter_items"
+]
+
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+_DECODER = json.JSONDecoder()
+
+
+class _Reader:
+
+    __slots__: typing.List = [
+        "chunks",
+        "decoder",
+        "buffer",
+        "position",
+        "exhausted"
+    ]
+
+    def __init__(self, chunks: typing.AsyncIterator[bytes]) -> None:
+        self.chunks = chunks.__aiter__()
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.position = 0
+        self.exhausted = False
+
+    async def fill(self) -> None:
+        if self.exhausted:
+            raise json.JSONDecodeError("unexpected end of response", self.buffer, self.position)
+
+        try:
+            chunk = await self.chunks.__anext__()
+
+        except StopAsyncIteration:
+            self.exhausted = True
+            self.buffer = self.buffer[self.position:] + self.decoder.decode(b"", final=True)
+
+        else:
+            # drop everything already consumed so the buffer only ever holds the current value
+            self.buffer = self.buffer[self.position:] + self.decoder.decode(chunk)
+
+        self.position = 0
+
+    async def peek(self) -> str:
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+
+            await self.fill()
+
+    async def expect(self, characters: str) -> str:
+        character = await self.peek()
+
+        if character not in characters:
+            raise json.JSONDecodeError(f"expected one of {characters!r}", self.buffer, self.position)
+
+        self.position += 1
+        return character
+
+    async def value(self) -> typing.Any:
+        await self.peek()
+
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.position)
+
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+
+            else:
+                # objects, arrays and strings end with their closing character, but a scalar such as
+                # 12 in a buffer holding "12." may continue in the next chunk until a delimiter follows
+                complete = end < len(self.buffer) and (
+                    self.buffer[self.position] in "{[\"" or self.buffer[end] in _DELIMITERS
+                )
+
+                if complete or self.exhausted:
+                    self.position = end
+                    return value
+
+            await self.fill()
+
+
+async def _walk(
+    reader: _Reader,
+    path: typing.Tuple[str, ...],
+    depth: int,
+    extras: typing.Dict[typing.Tuple[str, ...], typing.Any]
+) -> typing.AsyncIterator[typing.Any]:
+    await reader.expect("{")
+
+    if await reader.peek() == "}":
+        reader.position += 1
+        return
+
+    while True:
+        key = await reader.value()
+        await reader.expect(":")
+        location = (*path[:depth], key)
+        following = await reader.peek()
+
+        if key != path[depth]:
+            extras[location] = await reader.value()
+
+        elif depth + 1 < len(path) and following == "{":
+            async for item in _walk(reader, path, depth + 1, extras):
+                yield item
+
+        elif depth + 1 == len(path) and following == "[":
+            reader.position += 1
+
+            if await reader.peek() == "]":
+                reader.position += 1
+
+            else:
+                while True:
+                    yield await reader.value()
+
+                    if await reader.expect(",]") == "]":
+                        break
+
+        else:
+            extras[location] = await reader.value()
+
+        if await reader.expect(",}") == "}":
+            return
+
+
+async def iter_items(
+    chunks: typing.AsyncIterator[bytes],
+    path: typing.Sequence[str],
+    extras: typing.Dict[typing.Tuple[str, ...], typing.Any] = None
+) -> typing.AsyncIterator[typing.Any]:
+    """
+    Decode a JSON document incrementally, yielding each element of the array at a path as soon as it is parsed.
+
+    Only the element being decoded is held in memory, never the whole document. Values
+    found beside the path, such as "errors" or a "paginatorInfo" preceding the array, are
+    decoded whole and stored in extras by their own path.
+
+    :param chunks: The document as an async iterator of bytes, such as a response's content.
+    :param path: The keys leading from the top level object to the array, such as ("data", "nations", "data").
+    :param extras: A dictionary to store values found beside the path in.
+    :return: An async iterator yielding each element of the array.
+    """
+    reader = _Reader(chunks)
+
+    async for item in _walk(reader, tuple(path), 0, {} if extras is None else extras):
+        yield item
@@ -0,0 +1,297 @@
+# MIT License
+#
+# Copyright (c) 2021 God Empress Verin
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from pwpy import api, queries, loader, index
+
+import datetime
+import asyncio
+import typing
+
+
+__all__: typing.List[str] = [
+    "CREATED",
+    "UPDATED",
+    "DELETED",
+    "Change",
+    "NationSync"
+]
+
+
+CREATED: str = "created"
+UPDATED: str = "updated"
+DELETED: str = "deleted"
+
+
+class Change:
+    """
+    A single change to a synced nation.
+    """
+
+    __slots__: typing.List = [
+        "kind",
+        "nation",
+        "before",
+        "after"
+    ]
+
+    def __init__(self, kind: str, nation: int, before: typing.Optional[dict], after: typing.Optional[dict]) -> None:
+        self.kind = kind
+        self.nation = nation
+        self.before = before
+        self.after = after
+
+    def __repr__(self) -> str:
+        return f"Change({self.kind!r}, {self.nation!r})"
+
+
+# ordering nations by activity, most recent first, so incremental runs can stop at the cursor
+_BY_ACTIVITY = "{column:LAST_ACTIVE, order:DESC}"
+
+
+def _active(nation: dict) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(nation["last_active"])
+
+
+class NationSync:
+    """
+    Keeps a local store of nations current by refetching only those that changed.
+
+    The first run, and every full run, lists every nation with only its change markers, such
+    as "last_active" and "score". Nations whose markers moved or that are new are then fetched
+    in full in batches, and nations no longer listed are dropped as deleted.
+
+    Every other run is incremental. Nations are fetched in full ordered by last_active, most
+    recent first, and paging stops at the most recent last_active seen by the previous run,
+    so a refresh costs a page per 500 active nations rather than a listing of all of them.
+    Incremental runs only see nations whose last_active moved, so changes to other markers
+    of inactive nations, and deletions, are picked up by the next full run.
+
+    Every change is passed to subscribers and returned from :meth:`run`.
+    """
+
+    __slots__: typing.List = [
+        "fields",
+        "markers",
+        "args",
+        "prefetch",
+        "token",
+        "client",
+        "index",
+        "nations",
+        "runs",
+        "fetched",
+        "requests",
+        "full_every",
+        "cursor",
+        "_batch",
+        "_markers",
+        "_subscribers"
+    ]
+
+    def __init__(
+        self,
+        fields: typing.Iterable = queries.WAR_RANGE_FIELDS, *,
+        markers: typing.Iterable[str] = ("last_active", "score"),
+        args: dict = None,
+        batch: int = 500,
+        prefetch: int = 4,
+        full_every: int = 0,
+        token: str = None,
+        client: api.Client = None,
+        index: index.NationIndex = None
+    ) -> None:
+        """
+        :param fields: The fields to fetch for each changed nation.
+        :param markers: Fields whose change marks a nation as needing to be refetched.
+        :param args: Arguments to filter the synced nations by.
+        :param batch: Maximum number of nations fetched in full by a single query.
+        :param prefetch: Number of listing pages fetched ahead at most.
+        :param full_every: Number of runs between full runs, which also detect deletions. Defaults
+            to only the first run being full.
+        :param token: A valid Politics and War API key.
+        :param client: A client to send the queries with.
+        :param index: A nation index to keep in step with the store.
+        """
+        self.fields = tuple(fields)
+        self.markers = tuple(markers)
+        self.full_every = full_every
+        self.cursor: typing.Optional[datetime.datetime] = None
+        self.requests = 0
+        self.args = args
+        self.prefetch = prefetch
+        self.token = token
+        self.client = client
+        self.index = index
+        self.nations: typing.Dict[int, dict] = {}
+        self.runs = 0
+        self.fetched = 0
+        self._batch = batch
+        self._markers: typing.Dict[int, tuple] = {}
+        self._subscribers: typing.List[typing.Callable[[Change], typing.Any]] = []
+
+    def subscribe(self, callback: typing.Callable[[Change], typing.Any]) -> None:
+        """
+        Register a callback, or coroutine function, to be called with every change.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: typing.Callable[[Change], typing.Any]) -> None:
+        self._subscribers.remove(callback)
+
+    async def _publish(self, changes: typing.List[Change]) -> None:
+        for callback in self._subscribers:
+            for change in changes:
+                result = callback(change)
+
+                if asyncio.iscoroutine(result):
+                    await result
+
+    def _apply(self, change: Change) -> None:
+        if change.kind == DELETED:
+            self.nations.pop(change.nation, None)
+            self._markers.pop(change.nation, None)
+
+            if self.index is not None:
+                self.index.remove(change.nation)
+
+        else:
+            self.nations[change.nation] = change.after
+
+            if self.index is not None:
+                self.index.update(change.after)
+
+    def _stale(self, nation: int, markers: tuple) -> bool:
+        return self._markers.get(nation) != markers
+
+    def _advance(self, nations: typing.Iterable[dict]) -> None:
+        for nation in nations:
+            if nation.get("last_active"):
+                active = _active(nation)
+
+                if self.cursor is None or active > self.cursor:
+                    self.cursor = active
+
+    async def _full(self) -> typing.List[Change]:
+        listing = {}
+        pages = queries.iter_nation_pages(
+            ("id", *self.markers), args=self.args, prefetch=self.prefetch, token=self.token, client=self.client
+        )
+
+        async for page in pages:
+            self.requests += 1
+
+            for nation in page:
+                listing[int(nation["id"])] = tuple(nation.get(marker) for marker in self.markers)
+
+            self._advance(page)
+
+        stale = [nation for nation, markers in listing.items() if self._stale(nation, markers)]
+        deleted = [nation for nation in self._markers if nation not in listing]
+
+        fetcher = loader.Loader("nations", self.fields, max_batch=self._batch, token=self.token, client=self.client)
+        records = await fetcher.load_many(stale)
+        self.fetched += len(stale)
+        self.requests += fetcher.batches
+
+        changes = []
+
+        for nation, record in zip(stale, records):
+            if record is None:
+                if nation in self._markers:
+                    deleted.append(nation)
+
+                continue
+
+            before = self.nations.get(nation)
+            changes.append(Change(CREATED if before is None else UPDATED, nation, before, record))
+            self._markers[nation] = listing[nation]
+
+        for nation in deleted:
+            changes.append(Change(DELETED, nation, self.nations.get(nation), None))
+
+        return changes
+
+    async def _incremental(self) -> typing.List[Change]:
+        fields = (*self.fields, *(marker for marker in ("last_active", *self.markers) if marker not in self.fields))
+        args = {**(self.args or {}), "orderBy": _BY_ACTIVITY}
+        pages = queries.iter_nation_pages(
+            fields, args=args, first=self._batch, prefetch=1, token=self.token, client=self.client
+        )
+        active = []
+
+        try:
+            async for page in pages:
+                self.requests += 1
+                active.extend(nation for nation in page if _active(nation) >= self.cursor)
+
+                # nations active at the cursor itself are refetched, as others may share its time
+                if not page or _active(page[-1]) < self.cursor:
+                    break
+
+        finally:
+            await pages.aclose()
+
+        self.fetched += len(active)
+        changes = []
+
+        for record in active:
+            nation = int(record["id"])
+            markers = tuple(record.get(marker) for marker in self.markers)
+
+            if not self._stale(nation, markers):
+                continue
+
+            before = self.nations.get(nation)
+            changes.append(Change(CREATED if before is None else UPDATED, nation, before, record))
+            self._markers[nation] = markers
+
+        self._advance(active)
+        return changes
+
+    async def run(self, *, full: bool = False) -> typing.List[Change]:
+        """
+        Bring the store up to date.
+
+        :param full: Whether to list every nation, detecting deletions, rather than only recently active ones.
+        :return: The changes applied, in the order they were applied.
+        """
+        if self.client is None:
+            async with api.Client(self.token) as client:
+                self.client = client
+
+                try:
+                    return await self.run(full=full)
+
+                finally:
+                    self.client = None
+
+        full = full or self.cursor is None or bool(self.full_every and self.runs % self.full_every == 0)
+        changes = await (self._full() if full else self._incremental())
+
+        for change in changes:
+            self._apply(change)
+
+        self.runs += 1
+        await self._publish(changes)
+
+        return changes
@@ -25,6 +25,8 @@ __all__: typing.List[str] = [
     "parse_query",
     "parse_errors",
     "score_range",
+    "infra_unit_cost",
+    "land_unit_cost",
     "infra_cost",
     "land_cost",
     "city_cost",
@@ -65,6 +67,9 @@ def parse_errors(data) -> None:
 def parse_query(query: dict) -> str:
     """
     Parse a provided dictionary into a formatted gql string.
+
+    An entry may carry an "alias" key, in which case its result is returned under that
+    alias rather than the field name, allowing the same field to be queried repeatedly.
     """
     def parse_variables(variables):
         parsed = []
@@ -87,12 +92,19 @@ def parse_query(query: dict) -> str:
 
         return parsed
 
+    def parse_value(value):
+        if isinstance(value, bool):
+            return "true" if value else "false"
+
+        return value
+
     parsed_queries = []
 
     for name, entry in query.items():
-        parsed_args = " ".join(f"{key}:{value}" for key, value in entry["args"].items())
+        parsed_args = " ".join(f"{key}:{parse_value(value)}" for key, value in entry["args"].items())
         parsed_variables = " ".join(parse_variables(entry["variables"]))
-        parsed_queries.append(f"{name}({parsed_args}) {{{parsed_variables}}}")
+        alias = f"{entry['alias']}: " if entry.get("alias") else ""
+        parsed_queries.append(f"{alias}{name}({parsed_args}) {{{parsed_variables}}}")
 
     return " ".join(parsed_queries)
 
@@ -109,6 +121,24 @@ def score_range(score: float) -> typing.Tuple[float, float]:
     return min_score, max_score
 
 
+def infra_unit_cost(amount: int) -> float:
+    """
+    Calculate the cost of a single unit of infrastructure at a given amount.
+
+    :param amount: The infrastructure amount the unit is bought at. Arrays are computed element-wise.
+    """
+    return ((abs(amount - 10) ** 2.2) / 710) + 300
+
+
+def land_unit_cost(amount: int) -> float:
+    """
+    Calculate the cost of a single unit of land at a given amount.
+
+    :param amount: The land amount the unit is bought at. Arrays are computed element-wise.
+    """
+    return (.002 * (amount-20) * (amount-20)) + 50
+
+
 def infra_cost(starting: int, to_buy: int) -> float:
     """
     Calculate the cost to purchase or sell infrastructure.
@@ -116,9 +146,6 @@ def infra_cost(starting: int, to_buy: int) -> float:
     :param starting: A starting infrastructure amount.
     :param to_buy: The desired infrastructure amount.
     """
-    def unit_cost(amount: int):
-        return ((abs(amount - 10) ** 2.2) / 710) + 300
-
     difference = to_buy - starting
     cost = 0
 
@@ -127,17 +154,17 @@ def infra_cost(starting: int, to_buy: int) -> float:
 
     if difference > 100 and difference % 100 != 0:
         delta = difference % 100
-        cost += (round(unit_cost(starting), 2) * delta)
+        cost += (round(infra_unit_cost(starting), 2) * delta)
         starting += delta
         difference -= delta
 
     for _ in range(math.floor(difference // 100)):
-        cost += round(unit_cost(starting), 2) * 100
+        cost += round(infra_unit_cost(starting), 2) * 100
         starting += 100
         difference -= 100
 
     if difference:
-        cost += (round(unit_cost(starting), 2) * difference)
+        cost += (round(infra_unit_cost(starting), 2) * difference)
 
     return cost
 
@@ -150,9 +177,6 @@ def land_cost(starting: int, to_buy: int) -> float:
     :param to_buy: The desired land amount.
     :return: The cost to purchase or sell land.
     """
-    def unit_cost(amount: int):
-        return (.002 * (amount-20) * (amount-20)) + 50
-
     difference = to_buy - starting
     cost = 0
 
@@ -161,17 +185,17 @@ def land_cost(starting: int, to_buy: int) -> float:
 
     if difference > 500 and difference % 500 != 0:
         delta = difference % 500
-        cost += round(unit_cost(starting), 2) * delta
+        cost += round(land_unit_cost(starting), 2) * delta
         starting += delta
         difference -= delta
 
     for _ in range(math.floor(difference // 500)):
-        cost += round(unit_cost(starting), 2) * 500
+        cost += round(land_unit_cost(starting), 2) * 500
         starting += 500
         difference -= 500
 
     if difference:
-        cost += (round(unit_cost(starting), 2) * difference)
+        cost += (round(land_unit_cost(starting), 2) * difference)
 
     return cost
 
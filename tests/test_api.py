@@ -16,15 +16,17 @@
 
 
 from aioresponses import aioresponses
-from pwpy import urls, exceptions
+from pwpy import urls, exceptions, codec
 from pwpy import api
 
+import asyncio
 import pytest
 
 
 def test_set_token():
     api.set_token("test")
     assert api.TOKEN == "test"
+    api.set_token(None)
 
 
 @pytest.mark.asyncio
@@ -69,3 +71,160 @@ async def test_fetch_query():
         response = await api.fetch_query(test_query, token=token)
 
     assert response == test_response["data"]
+
+
+@pytest.mark.asyncio
+async def test_client():
+    test_query = {"nations": {"args": {"id": 34904, "first": 1}, "variables": {"data": ("id",)}}}
+    test_response = {"data": {"nations": {"data": [{"id": 34904}]}}}
+    token = "test"
+
+    async with api.Client(token) as client:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=200, payload=test_response, repeat=True)
+            first = await api.fetch_query(test_query, client=client)
+            session = client.session
+            second = await client.fetch_query(test_query)
+
+        assert first == second == test_response["data"]
+        assert client.session is session
+
+    assert client.closed
+
+
+@pytest.mark.asyncio
+async def test_bulk_query():
+    token = "test"
+    bulk = api.BulkQuery()
+    handles = [
+        bulk.insert({"nations": {"args": {"id": nation, "first": 1}, "variables": {"data": ("id",)}}})
+        for nation in range(3)
+    ]
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, status=200, payload={"data": {
+            "q0_0": {"data": [{"id": 0}]},
+            "q1_0": {"data": [{"id": 1}]}
+        }})
+        mock.post(urls.API + token, status=200, payload={"data": {
+            "q2_0": {"data": [{"id": 2}]}
+        }})
+        response = await bulk.fetch_query(token=token, chunk_size=2)
+
+    for nation, handle in enumerate(handles):
+        assert response[handle] == {"nations": {"data": [{"id": nation}]}}
+
+
+@pytest.mark.asyncio
+async def test_bulk_query_retries():
+    token = "test"
+    bulk = api.BulkQuery()
+    handles = [
+        bulk.insert({"nations": {"args": {"id": nation, "first": 1}, "variables": {"data": ("id",)}}})
+        for nation in range(3)
+    ]
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, status=200, payload={"data": {"q0_0": {"data": [{"id": 0}]}}})
+        mock.post(urls.API + token, status=502, body="<html>Bad Gateway</html>")
+        mock.post(urls.API + token, status=200, payload={"errors": [{"message": "Cannot query field \"oops\""}]})
+        mock.post(urls.API + token, status=200, payload={"data": {"q1_0": {"data": [{"id": 1}]}}})
+        result = await bulk.fetch_query(token=token, chunk_size=1, retries=1, backoff=0)
+
+        assert not result.ok and result[handles[0]] == {"nations": {"data": [{"id": 0}]}}
+        assert handles[1] in result
+        assert [(chunk.handles, type(chunk.error), chunk.attempts) for chunk in result.failed] == [
+            ([handles[2]], exceptions.UnexpectedResponse, 1)
+        ]
+
+        with pytest.raises(exceptions.UnexpectedResponse):
+            result.raise_for_failures()
+
+        mock.post(urls.API + token, status=200, payload={"data": {"q2_0": {"data": [{"id": 2}]}}})
+        await result.retry(token=token, backoff=0)
+
+    assert result.ok and len(result) == 3
+    assert result[handles[2]] == {"nations": {"data": [{"id": 2}]}}
+
+
+@pytest.mark.asyncio
+async def test_client_package_token():
+    test_query = {"nations": {"args": {"id": 34904, "first": 1}, "variables": {"data": ("id",)}}}
+    test_response = {"data": {"nations": {"data": [{"id": 34904}]}}}
+    token, previous = "package", api.TOKEN
+    api.set_token(token)
+
+    try:
+        async with api.Client() as client:
+            with aioresponses() as mock:
+                mock.post(urls.API + token, status=200, payload=test_response)
+                assert await client.fetch_query(test_query) == test_response["data"]
+
+    finally:
+        api.set_token(previous)
+
+
+@pytest.mark.asyncio
+async def test_undecodable_responses():
+    test_query = {"nations": {"args": {"first": 1}, "variables": {"data": ("id",)}}}
+    token = "test"
+
+    async with api.Client(token) as client:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=502, body="<html>Bad Gateway</html>", repeat=True)
+
+            with pytest.raises(exceptions.ServerError):
+                await client.fetch_query(test_query)
+
+            with pytest.raises(exceptions.ServerError):
+                [nation async for nation in client.stream_query(test_query, "nations")]
+
+
+@pytest.mark.asyncio
+async def test_client_coalesce():
+    test_query = {"nations": {"args": {"id": 34904, "first": 1}, "variables": {"data": ("id",)}}}
+    test_response = {"data": {"nations": {"data": [{"id": 34904}]}}}
+    token = "test"
+
+    async with api.Client(token, coalesce=True) as client:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=200, payload=test_response)
+            responses = await asyncio.gather(*(client.fetch_query(test_query) for _ in range(5)))
+
+        assert all(response == test_response["data"] for response in responses)
+        assert responses[0] is not responses[1]
+        assert client.stats() == {"requests": 1, "coalesced": 4, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_compiled_query():
+    compiled = api.CompiledQuery("Nation", {
+        "nations": {"args": {"id": "$id", "first": 1}, "variables": {"data": ("id",)}}
+    }, {"id": "[Int]"})
+    test_response = {"data": {"nations": {"data": [{"id": 34904}]}}}
+    token = "test"
+
+    assert compiled.document == "query Nation($id: [Int]) {nations(id:$id first:1) {data {id}}}"
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, status=200, payload=test_response)
+        response = await api.fetch_query(compiled, variables={"id": [34904]}, token=token)
+        payload = next(iter(mock.requests.values()))[0].kwargs["json"]
+
+    assert response == test_response["data"]
+    assert payload == {"query": compiled.document, "variables": {"id": [34904]}}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("json_codec", codec.available())
+async def test_client_codec(json_codec):
+    test_query = {"nations": {"args": {"id": 34904, "first": 1}, "variables": {"data": ("id",)}}}
+    test_response = {"data": {"nations": {"data": [{"id": 34904, "nation_name": "Ünited"}]}}}
+    token = "test"
+
+    async with api.Client(token, codec=json_codec) as client:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=200, payload=test_response)
+            response = await client.fetch_query(test_query)
+
+    assert response == test_response["data"]
@@ -0,0 +1,138 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from aioresponses import aioresponses
+from pwpy import api, cache, urls
+
+import concurrent.futures
+import sqlite3
+import pytest
+import time
+
+
+def test_query_tags():
+    fields, tags = cache.query_tags("q0: nations(id:[1, 2] first:2) {data {id}} alliances(id:7) {data {id}}")
+    assert fields == ("nations", "alliances")
+    assert tags == {("nations", 1), ("nations", 2), ("alliances", 7)}
+
+    fields, tags = cache.query_tags("nations(alliance_id:7 first:500) {data {id}}")
+    assert tags == {("alliances", 7)}
+
+    fields, tags = cache.query_tags("query Nation($id: [Int]) {nations(id:$id first:1) {data {id}}}", {"id": [3]})
+    assert fields == ("nations",)
+    assert tags == {("nations", 3)}
+
+
+def test_incomplete_cache():
+    class Incomplete(cache.Cache):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_memory_cache_eviction():
+    store = cache.MemoryCache(max_entries=2)
+
+    for count in range(3):
+        store.store("test", f"nations(id:{count}) {{data {{id}}}}", {"nations": {"data": [{"id": count}]}})
+
+    assert len(store) == 2
+    assert store.evictions == 1
+    assert store.lookup("test", "nations(id:0) {data {id}}") is None
+    assert store.lookup("test", "nations(id:2) {data {id}}") == {"nations": {"data": [{"id": 2}]}}
+    assert store.lookup("other", "nations(id:2) {data {id}}") is None
+
+    assert store.invalidate(nation=2) == 1
+    assert store.lookup("test", "nations(id:2) {data {id}}") is None
+    assert store.stats() == {"entries": 1, "hits": 1, "misses": 3, "evictions": 1, "expirations": 0}
+
+
+def test_memory_cache_bytes_and_ttl():
+    store = cache.MemoryCache(max_bytes=100, ttls={"alliances": 0.01})
+    store.store("test", "nations(id:1) {data {id}}", {"padding": "x" * 60})
+    store.store("test", "nations(id:2) {data {id}}", {"padding": "x" * 60})
+    assert len(store) == 1
+    assert store.size <= 100
+
+    store.store("test", "alliances(id:1) {data {id}}", {})
+    time.sleep(0.02)
+    assert store.lookup("test", "alliances(id:1) {data {id}}") is None
+    assert store.expirations == 1
+
+
+@pytest.mark.asyncio
+async def test_client_cache():
+    test_query = {"nations": {"args": {"id": 34904, "first": 1}, "variables": {"data": ("id",)}}}
+    test_response = {"data": {"nations": {"data": [{"id": 34904}]}}}
+    token = "test"
+
+    async with api.Client(token, cache=cache.MemoryCache()) as client:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=200, payload=test_response)
+            first = await client.fetch_query(test_query)
+            second = await client.fetch_query(test_query)
+
+        assert first == second == test_response["data"]
+        assert client.requests == 1
+        assert client.cache.hits == 1
+
+
+def test_sqlite_cache(tmp_path):
+    path = str(tmp_path / "responses.db")
+    store = cache.SQLiteCache(path, max_bytes=100, compact_every=1)
+
+    for count in range(5):
+        store.store("test", f"nations(id:{count}) {{data {{id}}}}", {"nations": {"data": [{"id": count}]}})
+
+    assert store.size <= 100
+    assert store.evictions > 0
+    store.close()
+
+    store = cache.SQLiteCache(path)
+    assert store.lookup("test", "nations(id:4) {data {id}}") == {"nations": {"data": [{"id": 4}]}}
+    assert store.invalidate(nation=4) == 1
+    assert store.lookup("test", "nations(id:4) {data {id}}") is None
+    store.close()
+
+
+def test_sqlite_cache_reads(tmp_path):
+    path = str(tmp_path / "responses.db")
+    store = cache.SQLiteCache(path, ttls={"alliances": 0.05})
+    store.store("test", "nations(id:1) {data {id}}", {"nations": {"data": [{"id": 1}]}})
+    store.store("test", "alliances(id:2) {data {id}}", {"alliances": {"data": [{"id": 2}]}})
+    changes = store._connection.total_changes
+    time.sleep(0.1)
+
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        found = list(pool.map(lambda _: store.lookup("test", "nations(id:1) {data {id}}"), range(20)))
+
+    assert found == [{"nations": {"data": [{"id": 1}]}}] * 20
+    assert store.lookup("test", "alliances(id:2) {data {id}}") is None
+    assert store._connection.total_changes == changes
+
+    with sqlite3.connect(path) as connection:
+        before = connection.execute("SELECT accessed FROM responses ORDER BY key").fetchall()
+
+    assert store.compact() == 1
+
+    with sqlite3.connect(path) as connection:
+        after = connection.execute("SELECT accessed FROM responses").fetchall()
+
+    assert len(after) == 1 and after[0][0] > max(accessed for accessed, in before)
+    store.close()
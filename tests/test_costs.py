@@ -0,0 +1,77 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pwpy import costs, utils
+
+import numpy
+
+
+def test_stepped_costs_match_scalar():
+    rng = numpy.random.default_rng(0)
+
+    for batch, scalar, limit in ((costs.infra_cost, utils.infra_cost, 5000), (costs.land_cost, utils.land_cost, 10000)):
+        starting = numpy.concatenate([rng.integers(0, limit, 2000), [0, 100, 250, 1000, 600]])
+        target = numpy.concatenate([rng.integers(0, limit, 2000), [0, 200, 250, 500, 1100]])
+        expected = [scalar(int(start), int(end)) for start, end in zip(starting, target)]
+        assert batch(starting, target).tolist() == expected
+
+        starting, target = numpy.round(rng.uniform(0, limit, (2, 500)), 2)
+        expected = [scalar(float(start), float(end)) for start, end in zip(starting, target)]
+        assert batch(starting, target).tolist() == expected
+
+
+def test_stepped_costs_broadcast():
+    assert costs.infra_cost(1000, [500, 1000, 2550]).tolist() == [
+        utils.infra_cost(1000, 500), 0, utils.infra_cost(1000, 2550)
+    ]
+    assert costs.land_cost([[20, 3000]], 3000).shape == (1, 2)
+
+
+def test_round_matches_builtin():
+    amounts = numpy.array([0.005, 0.015, 1.005, 2.675, 10.125])
+    assert costs._round(amounts, lambda amount: amount).tolist() == [round(amount, 2) for amount in amounts.tolist()]
+
+
+def test_city_cost():
+    cities = numpy.arange(1, 100)
+    assert costs.city_cost(cities).tolist() == [utils.city_cost(int(city)) for city in cities]
+
+
+def test_cost_tables_match_scalar():
+    rng = numpy.random.default_rng(1)
+
+    for table, scalar in ((costs.InfraCostTable, utils.infra_cost), (costs.LandCostTable, utils.land_cost)):
+        for options in ({}, {"scale": 100}, {"lazy": True, "max_bytes": 4096}):
+            prices = table(**options)
+            decimals = 2 if options.get("scale") else 0
+
+            for starting, target in numpy.round(rng.uniform(0, prices.limit, (500, 2)), decimals).tolist():
+                assert abs(prices.cost(starting, target) - scalar(starting, target)) < 0.01
+
+            if options.get("lazy"):
+                assert prices.nbytes <= 4096
+
+
+def test_cost_table_edges():
+    prices = costs.InfraCostTable(limit=2000)
+
+    assert prices.cost(1500, 1500) == 0
+    assert prices.cost(1500, 1000) == utils.infra_cost(1500, 1000)
+    assert prices.cost(1500, 1600) == utils.infra_cost(1500, 1600)
+    assert prices.cost(1500, 1550.5) == utils.infra_cost(1500, 1550.5)
+    assert prices.cost(1500, 2500) == utils.infra_cost(1500, 2500)
+    assert abs(prices.cost(0, 2000) - utils.infra_cost(0, 2000)) < 0.01
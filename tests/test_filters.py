@@ -0,0 +1,78 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pwpy import filters
+
+
+def nation(identifier, color="green", alliance=0, wars=(), cities=(True,), soldiers=0):
+    return {
+        "id": identifier,
+        "color": color,
+        "alliance_id": alliance,
+        "soldiers": soldiers,
+        "defensive_wars": [{"turns_left": turns, "winner": winner} for turns, winner in wars],
+        "cities": [{"powered": powered} for powered in cities]
+    }
+
+
+NATIONS = [
+    nation(1),
+    nation(2, color="beige"),
+    nation(3, alliance="7"),
+    nation(4, wars=((3, 0), (5, 0), (2, 0))),
+    nation(5, wars=((3, 0), (0, 0), (2, 0), (0, 4))),
+    nation(6, cities=(True, False)),
+    nation(7, cities=(), soldiers=50000)
+]
+
+
+def test_war_range():
+    table = filters.NationTable(NATIONS)
+    targets = table.filter(*filters.war_range(omit=7))
+    assert [target["id"] for target in targets] == [1, 5, 7]
+
+    targets = table.filter(*filters.war_range(powered=False))
+    assert [target["id"] for target in targets] == [1, 3, 5, 6, 7]
+
+
+def test_custom_predicate():
+    table = filters.NationTable(NATIONS)
+    targets = table.filter(filters.not_beige, lambda columns: columns["soldiers"] > 1000)
+    assert [target["id"] for target in targets] == [7]
+    assert table["ongoing_defensive"].tolist() == [0, 0, 0, 3, 2, 0, 0]
+
+
+def test_range_matrix():
+    def member(identifier, score, offensive=0, defensive=0):
+        return {
+            "id": identifier,
+            "score": score,
+            "offensive_wars": [{"turns_left": 5, "winner": 0}] * offensive,
+            "defensive_wars": [{"turns_left": 5, "winner": 0}] * defensive
+        }
+
+    ours = [member(1, 2000.0, offensive=5), member(2, 1000.0), member(3, 100.0)]
+    theirs = [member(10, 800.0), member(11, 1750.0, defensive=3), member(12, 3500.0), member(13, 5000.0)]
+
+    matrix = filters.range_matrix(ours, theirs)
+    assert matrix.adjacency() == {3: [], 2: [10, 11], 1: [11, 12]}
+    assert matrix.counts.tolist() == [0, 2, 2]
+    assert matrix.offensive_slots.tolist() == [5, 5, 0]
+    assert [target["id"] for target in matrix.targets(1, open_slots=True)] == [10]
+
+    reverse = filters.range_matrix(theirs, ours)
+    assert reverse.adjacency() == {10: [2], 11: [1], 12: [], 13: []}
@@ -0,0 +1,66 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pwpy import index
+
+
+def nation(identifier, score, color="green", alliance=0):
+    return {
+        "id": str(identifier),
+        "score": score,
+        "color": color,
+        "alliance_id": alliance,
+        "defensive_wars": [],
+        "cities": [{"powered": True}]
+    }
+
+
+def test_nation_index():
+    nations = index.NationIndex([
+        nation(1, 500.0),
+        nation(2, 800.0),
+        nation(3, 1200.0, color="beige"),
+        nation(4, 1700.0, alliance=5),
+        nation(5, 2000.0)
+    ])
+
+    assert [int(target["id"]) for target in nations.between(800, 1700)] == [2, 3, 4]
+    assert [int(target["id"]) for target in nations.within_war_range(1000)] == [2, 4]
+    assert [int(target["id"]) for target in nations.within_war_range(1000, omit_alliance=5)] == [2]
+    assert [int(target["id"]) for target in nations.within_war_range(1000, alliance=5)] == [4]
+
+    nations.update(nation(5, 1000.0))
+    nations.remove(2)
+    assert 2 not in nations
+    assert [int(target["id"]) for target in nations.within_war_range(1000)] == [5, 4]
+    assert len(nations) == 4
+
+
+def test_nation_index_changed_in_place():
+    nations = index.NationIndex([nation(identifier, identifier * 10.0) for identifier in range(1, 6)])
+
+    nations.get(2)["score"] = 35.0
+    nations.update(nations.get(2))
+    assert [int(target["id"]) for target in nations.between(0, 100)] == [1, 3, 2, 4, 5]
+
+    nations.get(5)["score"] = 5.0
+    nations.update(nations.get(5))
+    assert [int(target["id"]) for target in nations.between(0, 100)] == [5, 1, 3, 2, 4]
+
+    nations.get(4)["color"] = "beige"
+    nations.update(nations.get(4))
+    assert [int(target["id"]) for target in nations.within_war_range(40)] == [3, 2]
@@ -0,0 +1,44 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from aioresponses import aioresponses, CallbackResult
+from pwpy import loader, urls
+
+import asyncio
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_nation_loader():
+    token = "test"
+    requests = []
+
+    def callback(_, **kwargs):
+        ids = kwargs["json"]["variables"]["id"]
+        requests.append(ids)
+        nations = [{"id": str(nation), "score": 10.0} for nation in ids if nation != 404]
+        return CallbackResult(status=200, payload={"data": {"nations": {"data": nations}}})
+
+    nations = loader.NationLoader(("score",), token=token)
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=callback, repeat=True)
+        results = await asyncio.gather(*(nations.load(nation) for nation in (1, 2, 3, 2, 404)))
+
+    assert len(requests) == 1
+    assert nations.batches == 1
+    assert [result and int(result["id"]) for result in results] == [1, 2, 3, 2, None]
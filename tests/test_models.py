@@ -0,0 +1,72 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from aioresponses import aioresponses
+from pwpy import models, queries, urls
+
+import pickle
+import pytest
+
+
+NATION = {
+    "id": "7",
+    "nation_name": "Requiem",
+    "score": "1520.25",
+    "alliance": {"id": "3", "name": "Rose"},
+    "cities": [{"id": "1", "powered": True}, {"id": "2", "powered": False}],
+    "defensive_wars": []
+}
+
+
+def test_nation_record():
+    nation = models.Nation(NATION)
+
+    assert nation.id == 7 and nation["score"] == 1520.25
+    assert nation.alliance.name == "Rose" and isinstance(nation.alliance, models.Alliance)
+    assert [city.powered for city in nation.cities] == [True, False]
+    assert isinstance(nation, models.Nation) and "cities" in nation and "color" not in nation
+    assert nation.get("color") is None
+    assert nation.to_dict()["cities"] == [{"id": 1, "powered": True}, {"id": 2, "powered": False}]
+    assert pickle.loads(pickle.dumps(nation)) == nation
+
+
+def test_record_layouts():
+    first, second = models.Nation({"id": 1, "score": 2.0}), models.Nation({"id": 2, "score": 3.0})
+
+    assert type(first) is type(second)
+    assert type(first) is not type(models.Nation({"id": 1}))
+    assert not hasattr(first, "__dict__")
+
+    try:
+        first.color
+
+    except AttributeError:
+        pass
+
+    else:
+        raise AssertionError("missing fields should not be readable")
+
+
+@pytest.mark.asyncio
+async def test_details_records():
+    token = "test"
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, payload={"data": {"nations": {"data": [NATION]}}})
+        nations = await queries.nation_details(7, records=True, token=token)
+
+    assert nations[0].nation_name == "Requiem" and nations[0].cities[1].id == 2
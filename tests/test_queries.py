@@ -0,0 +1,251 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from aioresponses import aioresponses, CallbackResult
+from pwpy import api, queries, urls, exceptions, filters, utils
+
+import pytest
+
+
+def paged_nations(pages: int, per_page: int):
+    def callback(_, **kwargs):
+        page = kwargs["json"]["variables"]["page"]
+        first = (page - 1) * per_page
+        body = {"data": [{"id": first + index} for index in range(per_page)]}
+
+        if "paginatorInfo" in kwargs["json"]["query"]:
+            body["paginatorInfo"] = {"lastPage": pages}
+
+        return CallbackResult(status=200, payload={"data": {"nations": body}})
+
+    return callback
+
+
+@pytest.mark.asyncio
+async def test_iter_nations():
+    token = "test"
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=paged_nations(5, 3), repeat=True)
+        nations = [nation["id"] async for nation in queries.iter_nations(("id",), first=3, prefetch=2, token=token)]
+
+    assert nations == list(range(15))
+
+
+@pytest.mark.asyncio
+async def test_iter_nation_pages():
+    token = "test"
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=paged_nations(4, 3), repeat=True)
+        pages = queries.iter_nation_pages(("id",), first=3, prefetch=2, token=token)
+        pages = [[nation["id"] for nation in page] async for page in pages]
+
+    assert pages == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10, 11]]
+
+
+@pytest.mark.asyncio
+async def test_iter_nations_stream():
+    token = "test"
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=paged_nations(4, 3), repeat=True)
+        nations = queries.iter_nations(("id",), first=3, prefetch=2, stream=True, token=token)
+        nations = [nation["id"] async for nation in nations]
+
+    assert nations == list(range(12))
+
+
+@pytest.mark.asyncio
+async def test_nation_details_profile():
+    token = "test"
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, status=200, payload={"data": {"nations": {"data": [{"id": 1, "score": 10.0}]}}})
+        response = await queries.nation_details(1, fields=("score",), profile="identity", token=token)
+        payload = next(iter(mock.requests.values()))[0].kwargs["json"]
+
+    assert response == [{"id": 1, "score": 10.0}]
+    assert "nation_name" in payload["query"] and "score" in payload["query"]
+    assert "soldiers" not in payload["query"]
+    assert payload["variables"] == {"id": [1]}
+
+    with pytest.raises(exceptions.InvalidQuery):
+        await queries.nation_details(1, profile="unknown", token=token)
+
+
+@pytest.mark.asyncio
+async def test_within_war_range_complete():
+    token = "test"
+
+    def callback(_, **kwargs):
+        page = kwargs["json"]["variables"]["page"]
+        assert "min_score:" in kwargs["json"]["query"] and "vacation_mode:false" in kwargs["json"]["query"]
+        body = {"data": [
+            {
+                "id": page * 10 + index,
+                "color": "beige" if index == 2 else "green",
+                "alliance_id": 0,
+                "soldiers": (page * 10 + index) * 1000,
+                "tanks": 0,
+                "aircraft": 0,
+                "ships": 0,
+                "missiles": 0,
+                "nukes": 0,
+                "cities": [{"powered": True}],
+                "defensive_wars": []
+            }
+            for index in range(3)
+        ]}
+
+        if "paginatorInfo" in kwargs["json"]["query"]:
+            body["paginatorInfo"] = {"lastPage": 3}
+
+        return CallbackResult(status=200, payload={"data": {"nations": body}})
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=callback, repeat=True)
+        targets = await queries.within_war_range(1000, complete=True, token=token)
+        weakest = await queries.within_war_range(1000, complete=True, rank=filters.weakness, top=3, token=token)
+        streamed = await queries.within_war_range(1000, complete=True, stream=True, token=token)
+        first = await queries.within_war_range(1000, complete=True, top=4, token=token)
+
+    assert [target["id"] for target in targets] == [10, 11, 20, 21, 30, 31]
+    assert streamed == targets
+    assert [target["id"] for target in weakest] == [10, 11, 20]
+    assert first == targets[:4]
+
+
+@pytest.mark.asyncio
+async def test_alliance_rebuild_cost():
+    token = "test"
+    nations = [
+        {"id": "1", "nation_name": "A", "alliance_position": "MEMBER", "num_cities": 2, "cities": [
+            {"id": "1", "infrastructure": 1000.0, "land": 1500.0},
+            {"id": "2", "infrastructure": 2500.0, "land": 3000.0}
+        ]},
+        {"id": "2", "nation_name": "B", "alliance_position": "APPLICANT", "num_cities": 1, "cities": [
+            {"id": "3", "infrastructure": 0.0, "land": 0.0}
+        ]},
+        {"id": "3", "nation_name": "C", "alliance_position": "OFFICER", "num_cities": 1, "cities": [
+            {"id": "4", "infrastructure": 1550.5, "land": 2000.0}
+        ]}
+    ]
+    payload = {"data": {"nations": {"data": nations, "paginatorInfo": {"lastPage": 1}}}}
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, payload=payload)
+        estimate = await queries.alliance_rebuild_cost(5, 2000, 3000, token=token)
+
+    first = estimate["nations"][1]
+    assert set(estimate["nations"]) == {1, 3}
+    assert first["infrastructure"] == utils.infra_cost(1000, 2000)
+    assert first["land"] == utils.land_cost(1500, 3000)
+    assert first["next_city"] == utils.city_cost(3)
+    assert estimate["nations"][3]["infrastructure"] == utils.infra_cost(1550.5, 2000)
+    assert estimate["total"] == sum(nation["total"] for nation in estimate["nations"].values())
+
+
+@pytest.mark.asyncio
+async def test_alliance_military():
+    token = "test"
+    nations = [
+        {"id": "1", "alliance_position": "MEMBER", "num_cities": 10, "soldiers": 150000, "tanks": 6250,
+         "aircraft": 750, "ships": 50, "missiles": 2, "nukes": 1},
+        {"id": "2", "alliance_position": "APPLICANT", "num_cities": 5, "soldiers": 75000, "tanks": 0,
+         "aircraft": 0, "ships": 0, "missiles": 0, "nukes": 0},
+        {"id": "3", "alliance_position": "LEADER", "num_cities": 10, "soldiers": 0, "tanks": 6250,
+         "aircraft": 750, "ships": 100, "missiles": 0, "nukes": 3}
+    ]
+    payload = {"data": {"nations": {"data": nations, "paginatorInfo": {"lastPage": 1}}}}
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, payload=payload)
+        military = await queries.alliance_military(5, token=token)
+
+    assert military["members"] == 2 and military["cities"] == 20
+    assert military["totals"]["nukes"] == 4
+    assert military["per_city"]["aircraft"] == 75
+    assert military["militarization"] == {"soldiers": 0.5, "tanks": 0.5, "aircraft": 1.0, "ships": 0.5}
+
+
+@pytest.mark.asyncio
+async def test_alliances_bank_contents_poll():
+    token = "test"
+    sent = []
+
+    def callback(_, **kwargs):
+        sent.append(kwargs["json"])
+        banks = [{"id": str(identifier), "money": identifier * 100.0} for identifier in kwargs["json"]["variables"]["id"]]
+        return CallbackResult(status=200, payload={"data": {"alliances": {"data": banks}}})
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=callback, repeat=True)
+        refreshes = queries.poll(queries.alliances_bank_contents, [3, 5, 3, 8], interval=0, token=token)
+        banks = [await refreshes.__anext__() for _ in range(2)]
+        await refreshes.aclose()
+
+    assert banks[0] == banks[1]
+    assert {identifier: bank["money"] for identifier, bank in banks[0].items()} == {3: 300.0, 5: 500.0, 8: 800.0}
+    assert len(sent) == 2 and sent[0] == sent[1]
+    assert sent[0]["variables"] == {"id": [3, 5, 8], "first": 3}
+
+
+@pytest.mark.asyncio
+async def test_alliances_details():
+    token = "test"
+
+    def callback(_, **kwargs):
+        assert "id discord_link" in kwargs["json"]["query"]
+        alliances = [{"id": str(identifier), "discord_link": "link"} for identifier in kwargs["json"]["variables"]["id"]]
+        return CallbackResult(status=200, payload={"data": {"alliances": {"data": alliances}}})
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=callback)
+        alliances = await queries.alliances_details([1, 2], fields=("discord_link",), records=True, token=token)
+
+    assert sorted(alliances) == [1, 2] and alliances[2].discord_link == "link"
+
+
+@pytest.mark.asyncio
+async def test_poll_shares_client():
+    clients = []
+
+    async def fetch(*, token, client):
+        clients.append(client)
+        return len(clients)
+
+    refreshes = queries.poll(fetch, interval=0, token="test")
+    assert [await refreshes.__anext__() for _ in range(3)] == [1, 2, 3]
+    await refreshes.aclose()
+
+    assert clients[0] is clients[1] is clients[2]
+    assert clients[0].closed
+
+
+@pytest.mark.asyncio
+async def test_package_token():
+    token, previous = "package", api.TOKEN
+    api.set_token(token)
+
+    try:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, payload={"data": {"nations": {"data": [{"id": "7"}]}}})
+            assert await queries.nation_details(7, fields=("id",)) == [{"id": "7"}]
+
+    finally:
+        api.set_token(previous)
@@ -0,0 +1,70 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from aioresponses import aioresponses
+from pwpy import api, urls, exceptions, scheduler
+
+import asyncio
+import pytest
+import time
+
+
+def test_parse_retry_after():
+    assert scheduler.parse_retry_after("5") == 5.0
+    assert scheduler.parse_retry_after(None, 10) == 10
+    assert scheduler.parse_retry_after("garbage", 3) == 3
+    assert scheduler.parse_retry_after("Thu, 01 Jan 1970 00:00:00 GMT") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_pacing():
+    pacer = scheduler.Scheduler(per_minute=600, burst=2, concurrency=2)
+    start = time.monotonic()
+
+    async def request():
+        async with pacer.slot("test"):
+            assert pacer.in_flight <= 2
+
+    await asyncio.gather(*(request() for _ in range(4)))
+
+    # two requests go out immediately, the remaining two wait a tenth of a second each
+    assert time.monotonic() - start >= 0.15
+    assert pacer.requests == 4
+    assert pacer.queue_depth == 0
+    assert pacer.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_retry():
+    test_query = {"nations": {"args": {"first": 1}, "variables": {"data": ("id",)}}}
+    test_response = {"data": {"nations": {"data": [{"id": 1}]}}}
+    token = "test"
+
+    async with api.Client(token, scheduler=scheduler.Scheduler(max_retries=1)) as client:
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=429, headers={"Retry-After": "0"})
+            mock.post(urls.API + token, status=200, payload=test_response)
+            response = await client.fetch_query(test_query)
+
+        assert response == test_response["data"]
+        assert client.scheduler.throttled == 1
+
+        with aioresponses() as mock:
+            mock.post(urls.API + token, status=429, headers={"Retry-After": "0"}, repeat=True)
+
+            with pytest.raises(exceptions.RateLimited):
+                await client.fetch_query(test_query)
@@ -0,0 +1,64 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pwpy import snapshot
+
+import numpy
+import os
+
+
+def test_snapshot_round_trip(tmp_path):
+    nations = [
+        {"id": "1", "alliance_id": "7", "nation_name": "Alpha", "color": "green", "score": 1000.5,
+         "last_active": "2022-01-01T00:00:00+00:00"},
+        {"id": "2", "alliance_id": "0", "nation_name": "Bêta", "color": "green", "score": 250.0,
+         "last_active": "2022-01-02T00:00:00+00:00"}
+    ]
+    alliances = [{"id": "7", "name": "Alpha Alliance", "acronym": "AA", "color": "green", "score": 1000.5}]
+
+    snapshot.write_table(str(tmp_path), nations, alliances)
+    loaded = snapshot.load(str(tmp_path))
+
+    assert len(loaded.nations) == 2
+    assert isinstance(loaded.nations["score"], numpy.memmap)
+    assert loaded.nations["id"].tolist() == [1, 2]
+    assert loaded.nations.string("nation_name", 1) == "Bêta"
+    assert loaded.nations["color"][0] == loaded.nations["color"][1]
+    assert loaded.nations.row(0)["last_active"] == 1640995200.0
+    assert loaded.alliances.row(0)["name"] == "Alpha Alliance"
+    assert loaded.alliances["average_score"].tolist() == [0.0]
+
+
+def test_snapshot_overwrite_while_loaded(tmp_path):
+    path = str(tmp_path)
+    alliances = [{"id": "7", "name": "Alpha Alliance"}]
+
+    snapshot.write_table(path, [{"id": str(nation), "nation_name": f"n{nation}"} for nation in range(3)], alliances)
+    first = snapshot.load(path)
+
+    for version in range(3):
+        nations = [{"id": str(100 + nation), "nation_name": f"v{version}"} for nation in range(5)]
+        snapshot.write_table(path, nations, alliances, keep=2)
+
+    assert first.nations["id"].tolist() == [0, 1, 2]
+    assert first.nations.string("nation_name", 2) == "n2"
+
+    latest = snapshot.load(path)
+    assert latest.nations["id"].tolist() == [100, 101, 102, 103, 104]
+    assert latest.nations.string("nation_name", 0) == "v2"
+    assert len([name for name in os.listdir(path) if name.startswith("v")]) == 2
+    assert not [name for name in os.listdir(path) if name.startswith(".staging") or name.endswith(".tmp")]
@@ -0,0 +1,63 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from pwpy import stream
+
+import json
+import pytest
+
+
+async def chunked(document: bytes, size: int):
+    for start in range(0, len(document), size):
+        yield document[start:start + size]
+
+
+@pytest.mark.asyncio
+async def test_iter_items():
+    nations = [{"id": index, "nation_name": "Ünited" * index, "score": 1234.5} for index in range(5)]
+    document = json.dumps({
+        "data": {"nations": {"paginatorInfo": {"lastPage": 3}, "data": nations}},
+        "extensions": None
+    }).encode()
+
+    for size in (1, 5, 64, len(document)):
+        extras = {}
+        items = [item async for item in stream.iter_items(chunked(document, size), ("data", "nations", "data"), extras)]
+        assert items == nations
+        assert extras == {("data", "nations", "paginatorInfo"): {"lastPage": 3}, ("extensions",): None}
+
+
+@pytest.mark.asyncio
+async def test_iter_items_errors():
+    document = json.dumps({"errors": [{"message": "Syntax Error"}], "data": None}).encode()
+    extras = {}
+    items = [item async for item in stream.iter_items(chunked(document, 7), ("data", "nations", "data"), extras)]
+
+    assert items == []
+    assert extras[("errors",)] == [{"message": "Syntax Error"}]
+    assert extras[("data",)] is None
+
+
+@pytest.mark.asyncio
+async def test_iter_items_split_scalars():
+    document = b'{"data":{"nations":{"data":[1.25e3, true, null, -7]}},"x":12.5,"y":false}'
+
+    for size in range(1, 8):
+        extras = {}
+        items = [item async for item in stream.iter_items(chunked(document, size), ("data", "nations", "data"), extras)]
+        assert items == [1250.0, True, None, -7]
+        assert extras == {("x",): 12.5, ("y",): False}
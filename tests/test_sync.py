@@ -0,0 +1,87 @@
+# This is part of Requiem
+# Copyright (C) 2020  God Empress Verin
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from aioresponses import aioresponses, CallbackResult
+from pwpy import api, sync, urls
+
+import pytest
+
+
+def stamp(minute: int) -> str:
+    return f"2022-01-01T00:{minute:02d}:00+00:00"
+
+
+@pytest.mark.asyncio
+async def test_nation_sync():
+    token = "test"
+    world = {
+        1: {"id": "1", "score": 100.0, "last_active": stamp(1)},
+        2: {"id": "2", "score": 200.0, "last_active": stamp(2)}
+    }
+    requested = []
+    pages = []
+
+    def callback(_, **kwargs):
+        query, variables = kwargs["json"]["query"], kwargs["json"]["variables"]
+
+        if "orderBy" in query:
+            pages.append(variables["page"])
+            ordered = sorted(world.values(), key=lambda nation: nation["last_active"], reverse=True)
+            first = (variables["page"] - 1) * variables["first"]
+            body = {"data": ordered[first:first + variables["first"]], "paginatorInfo": {"lastPage": 3}}
+
+        elif "page" in variables:
+            body = {"data": list(world.values()), "paginatorInfo": {"lastPage": 1}}
+
+        else:
+            requested.extend(variables["id"])
+            body = {"data": [world[nation] for nation in variables["id"] if nation in world]}
+
+        return CallbackResult(status=200, payload={"data": {"nations": body}})
+
+    received = []
+    syncer = sync.NationSync(("score", "last_active"), batch=2, client=api.Client(token))
+    syncer.subscribe(received.append)
+
+    with aioresponses() as mock:
+        mock.post(urls.API + token, callback=callback, repeat=True)
+
+        changes = await syncer.run()
+        assert [(change.kind, change.nation) for change in changes] == [("created", 1), ("created", 2)]
+        assert syncer.cursor.minute == 2
+
+        world[1] = {"id": "1", "score": 150.0, "last_active": stamp(5)}
+        world[3] = {"id": "3", "score": 300.0, "last_active": stamp(4)}
+        world[4] = {"id": "4", "score": 400.0, "last_active": stamp(0)}
+        del world[2]
+        requested.clear()
+
+        changes = await syncer.run()
+        assert [(change.kind, change.nation) for change in changes] == [("updated", 1), ("created", 3)]
+        assert pages == [1, 2] and requested == []
+        assert syncer.cursor.minute == 5
+
+        assert await syncer.run() == []
+        assert pages == [1, 2, 1]
+
+        changes = await syncer.run(full=True)
+        assert [(change.kind, change.nation) for change in changes] == [("created", 4), ("deleted", 2)]
+        assert requested == [4]
+
+    await syncer.client.close()
+    assert sorted(syncer.nations) == [1, 3, 4]
+    assert len(received) == 6
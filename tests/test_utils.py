@@ -66,6 +66,16 @@ def test_parse_query():
     assert query == target
 
 
+def test_parse_query_alias():
+    example = {"nations": {"alias": "q1", "args": {"id": 1}, "variables": {"data": "id"}}}
+    assert utils.parse_query(example) == "q1: nations(id:1) {data {id}}"
+
+
+def test_parse_query_booleans():
+    example = {"nations": {"args": {"vacation_mode": False, "first": 1}, "variables": {"data": "id"}}}
+    assert utils.parse_query(example) == "nations(vacation_mode:false first:1) {data {id}}"
+
+
 def test_score_range():
     min_att, max_att = utils.score_range(1000)
     assert min_att == 750.0